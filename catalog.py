@@ -0,0 +1,302 @@
+import json
+import os
+import sqlite3
+
+from config import DOWNLOAD_DIRECTORY
+
+
+class Catalog(object):
+    """
+        The Catalog object keeps track of books, their chapters (page ranges,
+        split pdf paths and hashes) and exercises in a SQLite database. The
+        -index.json and -data.json files are still what curators edit, so
+        the catalog can import them when they change and export them again
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.sep.join([DOWNLOAD_DIRECTORY, 'catalog.sqlite3'])
+        if not os.path.exists(os.path.dirname(os.path.abspath(self.path))):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)))
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY,
+                pdf_path TEXT NOT NULL UNIQUE,
+                pdf_mtime REAL,
+                pdf_size INTEGER,
+                index_mtime REAL,
+                index_json TEXT,
+                data_mtime REAL,
+                data_json TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chapters (
+                id INTEGER PRIMARY KEY,
+                book_id INTEGER NOT NULL REFERENCES books (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                section TEXT,
+                title TEXT NOT NULL,
+                start_page INTEGER,
+                end_page INTEGER,
+                path TEXT,
+                md5 TEXT,
+                size INTEGER,
+                mtime REAL,
+                sections TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chapters_book ON chapters (book_id, position);
+            CREATE INDEX IF NOT EXISTS chapters_path ON chapters (path);
+            CREATE TABLE IF NOT EXISTS exercises (
+                id INTEGER PRIMARY KEY,
+                chapter_id INTEGER NOT NULL REFERENCES chapters (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                description TEXT,
+                questions_json TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS exercises_chapter ON exercises (chapter_id, position);
+        """)
+
+        # Catalogs made before chapters kept their staging details and sections need those columns added
+        columns = [row['name'] for row in self.connection.execute("PRAGMA table_info(chapters)")]
+        for column, column_type in [('md5', 'TEXT'), ('size', 'INTEGER'), ('mtime', 'REAL'), ('sections', 'TEXT')]:
+            if column not in columns:
+                self.connection.execute("ALTER TABLE chapters ADD COLUMN {} {}".format(column, column_type))
+
+    def get_mtime(self, path):
+        return os.path.getmtime(path) if os.path.exists(path) else None
+
+    def get_book(self, parser):
+        """
+            Returns the catalog row for a pdf
+            Args: parser (PDFParser) parser for pdf
+            Returns sqlite3.Row (None if the pdf isn't in the catalog)
+        """
+        return self.connection.execute("SELECT * FROM books WHERE pdf_path = ?", (parser.download_url,)).fetchone()
+
+    def get_book_id(self, parser):
+        """ Returns the id of a pdf's book row, adding the row if needed """
+        self.connection.execute(
+            "INSERT OR IGNORE INTO books (pdf_path) VALUES (?)", (parser.download_url,)
+        )
+        stat = os.stat(parser.download_url) if os.path.exists(parser.download_url) else None
+        self.connection.execute(
+            "UPDATE books SET pdf_mtime = ?, pdf_size = ? WHERE pdf_path = ?",
+            (stat and stat.st_mtime, stat and stat.st_size, parser.download_url)
+        )
+        return self.get_book(parser)['id']
+
+    def save_index(self, parser):
+        """
+            Records the -index.json file for a pdf
+            Args: parser (PDFParser) parser for pdf
+            Returns None
+        """
+        with open(parser.index_path, 'rb') as fobj:
+            index_json = fobj.read().decode('utf-8')
+        with self.connection:
+            book_id = self.get_book_id(parser)
+            self.connection.execute(
+                "UPDATE books SET index_mtime = ?, index_json = ? WHERE id = ?",
+                (self.get_mtime(parser.index_path), index_json, book_id)
+            )
+
+    def save_data(self, parser, data_json, page_ranges=None):
+        """
+            Records the -data.json file for a pdf along with its chapters and exercises
+            Args:
+                - parser (PDFParser) parser for pdf
+                - data_json (str) contents of -data.json file
+                - page_ranges (list) page range data used to split the pdf (optional, see PDFParser.get_page_ranges)
+            Returns None
+
+            ---
+
+            Note: if page_ranges isn't given (e.g. an edited -data.json file is imported),
+            chapters keep the page ranges that were recorded for them before
+        """
+        with self.connection:
+            book_id = self.get_book_id(parser)
+
+            ranges = {}
+            if page_ranges is None:
+                for row in self.connection.execute("SELECT section, title, start_page, end_page FROM chapters WHERE book_id = ?", (book_id,)):
+                    ranges[(row['section'], row['title'])] = (row['start_page'], row['end_page'])
+            for sections, item in self.flatten(page_ranges or []):
+                ranges[(sections[-1] if sections else None, item['chapter'])] = (item['start'], item['end'])
+
+            self.connection.execute(
+                "UPDATE books SET data_mtime = ?, data_json = ? WHERE id = ?",
+                (self.get_mtime(parser.pdf_data_path), data_json, book_id)
+            )
+
+            # Replace the chapters and exercises
+            self.connection.execute("DELETE FROM chapters WHERE book_id = ?", (book_id,))
+            for position, (sections, chapter) in enumerate(self.flatten(json.loads(data_json))):
+                section = sections[-1] if sections else None
+                start, end = ranges.get((section, chapter['chapter']), (None, None))
+                chapter_id = self.connection.execute(
+                    "INSERT INTO chapters (book_id, position, section, title, start_page, end_page, path, md5, size, mtime, sections) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (book_id, position, section, chapter['chapter'], start, end, chapter.get('path'), chapter.get('md5'),
+                        chapter.get('size'), chapter.get('mtime'), json.dumps(sections, ensure_ascii=False))
+                ).lastrowid
+                self.connection.executemany(
+                    "INSERT INTO exercises (chapter_id, position, description, questions_json) VALUES (?, ?, ?, ?)",
+                    [(chapter_id, index, exercise.get('description'), json.dumps(exercise.get('questions') or [], ensure_ascii=False))
+                        for index, exercise in enumerate(chapter.get('exercises') or [])]
+                )
+
+    def flatten(self, data, sections=()):
+        """
+            Flattens -data.json or page range data into a list of chapters
+            Args:
+                - data (list) -data.json or page range data
+                - sections (tuple) headers the data is nested under (optional)
+            Returns list of (headers tuple, chapter dict) tuples
+        """
+        chapters = []
+        for item in data:
+            if 'header' in item:
+                chapters.extend(self.flatten(item['chapters'], sections=sections + (item['header'],)))
+            else:
+                chapters.append((sections, item))
+        return chapters
+
+    def has_data(self, parser):
+        """
+            Checks if a pdf's -data.json file has been recorded and hasn't changed since
+            Args: parser (PDFParser) parser for pdf
+            Returns boolean indicating if the catalog's copy is current
+        """
+        book = self.get_book(parser)
+        return bool(book) and book['data_json'] is not None and book['data_mtime'] == self.get_mtime(parser.pdf_data_path)
+
+    def get_chapter_paths(self, parser):
+        """
+            Returns the split pdf paths recorded for a pdf's chapters
+            Args: parser (PDFParser) parser for pdf
+            Returns list of (headers list, chapter title, split pdf path) tuples
+        """
+        chapters = []
+        for row in self.connection.execute(
+                "SELECT chapters.section, chapters.sections, chapters.title, chapters.path FROM chapters "
+                "JOIN books ON books.id = chapters.book_id WHERE books.pdf_path = ? ORDER BY chapters.position",
+                (parser.download_url,)):
+            if row['sections'] is not None:
+                sections = json.loads(row['sections'])
+            else:   # Recorded before chapters kept their sections
+                sections = [row['section']] if row['section'] else []
+            chapters.append((sections, row['title'], row['path']))
+        return chapters
+
+    def get_data(self, parser, object_hook=None):
+        """
+            Rebuilds a pdf's -data.json data from its chapters and exercises if the file hasn't changed since it was recorded
+            Args:
+                - parser (PDFParser) parser for pdf
+                - object_hook (function) json object_hook to load questions with (optional)
+            Returns list of pdf data (None if the file needs to be read again)
+        """
+        if not self.has_data(parser):
+            return None
+        book = self.get_book(parser)
+        chapters = self.connection.execute(
+            "SELECT id, title, path, md5, size, mtime, sections FROM chapters WHERE book_id = ? ORDER BY position", (book['id'],)
+        ).fetchall()
+        if any(chapter['sections'] is None for chapter in chapters):
+            return None     # Recorded before chapters kept their sections
+
+        exercises = {}
+        for exercise in self.connection.execute(
+                "SELECT exercises.chapter_id, exercises.description, exercises.questions_json FROM exercises "
+                "JOIN chapters ON chapters.id = exercises.chapter_id WHERE chapters.book_id = ? "
+                "ORDER BY exercises.chapter_id, exercises.position", (book['id'],)):
+            exercises.setdefault(exercise['chapter_id'], []).append({
+                "description": exercise['description'],
+                "questions": json.loads(exercise['questions_json'], object_hook=object_hook),
+            })
+
+        # Open and close headers as each chapter's sections change
+        data = []
+        open_sections = []      # List of (header, chapters list) for headers the current chapter is under
+        for chapter in chapters:
+            sections = json.loads(chapter['sections'])
+            depth = 0
+            while depth < min(len(sections), len(open_sections)) and sections[depth] == open_sections[depth][0]:
+                depth += 1
+            del open_sections[depth:]
+            for header in sections[depth:]:
+                item = {"header": header, "chapters": []}
+                (open_sections[-1][1] if open_sections else data).append(item)
+                open_sections.append((header, item['chapters']))
+
+            item = {"chapter": chapter['title'], "path": chapter['path'], "exercises": exercises.get(chapter['id'], [])}
+            for column in ('md5', 'size', 'mtime'):
+                if chapter[column] is not None:
+                    item[column] = chapter[column]
+            (open_sections[-1][1] if open_sections else data).append(item)
+        return data
+
+    def import_files(self, parser):
+        """
+            Records a pdf's -index.json and -data.json files if they have changed
+            Args: parser (PDFParser) parser for pdf
+            Returns list of str paths to imported files
+        """
+        imported = []
+        book = self.get_book(parser)
+        if os.path.exists(parser.index_path) and (not book or book['index_mtime'] != self.get_mtime(parser.index_path)):
+            self.save_index(parser)
+            imported.append(parser.index_path)
+        if os.path.exists(parser.pdf_data_path) and (not book or book['data_mtime'] != self.get_mtime(parser.pdf_data_path)):
+            with open(parser.pdf_data_path, 'rb') as fobj:
+                self.save_data(parser, fobj.read().decode('utf-8'))
+            imported.append(parser.pdf_data_path)
+        return imported
+
+    def export_files(self, parser):
+        """
+            Writes a pdf's -index.json and -data.json files from the catalog
+            Args: parser (PDFParser) parser for pdf
+            Returns list of str paths to exported files
+
+            ---
+
+            Note: files that have changed since they were recorded (e.g. a curator
+            edited them) are skipped so their edits aren't overwritten. Import them
+            first to keep the edits, or delete them to use the catalog's copy
+        """
+        exported = []
+        book = self.get_book(parser)
+        if not book:
+            return exported
+        for path, contents, column in [(parser.index_path, book['index_json'], 'index_mtime'), (parser.pdf_data_path, book['data_json'], 'data_mtime')]:
+            if contents is None:
+                continue
+            if os.path.exists(path) and self.get_mtime(path) != book[column]:
+                print('WARNING: Skipped {} (it has changed since it was recorded, please import it first)'.format(path))
+                continue
+            with open(path, 'wb') as fobj:
+                fobj.write(contents.encode('utf-8'))
+            with self.connection:
+                self.connection.execute("UPDATE books SET {} = ? WHERE id = ?".format(column), (self.get_mtime(path), book['id']))
+            exported.append(path)
+        return exported
+
+    def get_changed_books(self):
+        """
+            Returns the books whose pdf, -index.json or -data.json files have changed since they were recorded
+            Args: None
+            Returns list of str pdf paths
+        """
+        changed = []
+        for book in self.connection.execute("SELECT * FROM books ORDER BY pdf_path"):
+            filename, _ = os.path.splitext(book['pdf_path'])
+            stat = os.stat(book['pdf_path']) if os.path.exists(book['pdf_path']) else None
+            pdf_state = (stat.st_mtime, stat.st_size) if stat else (None, None)
+            if pdf_state != (book['pdf_mtime'], book['pdf_size']) \
+                    or self.get_mtime('{}-index.json'.format(filename)) != book['index_mtime'] \
+                    or self.get_mtime('{}-data.json'.format(filename)) != book['data_mtime']:
+                changed.append(book['pdf_path'])
+        return changed
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)), "downloads", "assets")
+MAX_DOWNLOADS = 8                                           # Number of assets to download at once
+
+
+class AssetFetcher(object):
+    """ Downloads page assets (stylesheets, images) a few at a time
+
+        Downloaded files are stored under the cache directory by the sha1 of their
+        contents, so an asset shared between pages (e.g. the same stylesheet) is only
+        downloaded once and stored once. If several pages ask for the same url at the
+        same time, they all wait on the same download.
+    """
+    def __init__(self, directory=CACHE_DIRECTORY, workers=MAX_DOWNLOADS):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "urls.json")     # Map of urls to content hashes
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.sessions = threading.local()
+        self.in_flight = {}                                         # Map of urls to futures
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as fobj:
+                self.index = json.loads(fobj.read().decode('utf-8'))
+
+    def get_session(self):
+        """ Returns a requests session for the current thread """
+        if not hasattr(self.sessions, 'session'):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def get_cache_path(self, digest):
+        """ Returns path to cached file with the given content hash """
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def fetch(self, url):
+        """ Starts downloading url if it isn't cached or already downloading
+            Returns Future of path to cached file
+        """
+        with self.lock:
+            future = self.in_flight.get(url)
+            if not future or (future.done() and future.exception()):    # Try failed downloads again
+                future = self.in_flight[url] = self.executor.submit(self.download, url)
+            return future
+
+    def download(self, url):
+        """ Downloads url into the cache (if it isn't cached already) and returns the cached path """
+        digest = self.index.get(url)
+        if digest and os.path.exists(self.get_cache_path(digest)):
+            return self.get_cache_path(digest)
+
+        response = self.get_session().get(url, timeout=60)
+        response.raise_for_status()
+        digest = hashlib.sha1(response.content).hexdigest()
+        cache_path = self.get_cache_path(digest)
+        if not os.path.exists(cache_path):
+            if not os.path.exists(os.path.dirname(cache_path)):
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(cache_path, threading.get_ident())
+            with open(tmp_path, 'wb') as fobj:
+                fobj.write(response.content)
+            os.replace(tmp_path, cache_path)
+
+        with self.lock:
+            self.index[url] = digest
+        return cache_path
+
+    def copy_to(self, url, destpath, subpath=""):
+        """ Waits for url to download and adds it to destpath
+            Returns path to file relative to destpath
+
+            Files are named after their content hash (keeping the url's extension), so
+            two urls with the same basename never overwrite each other and a url used
+            twice on a page is only added once
+        """
+        cache_path = self.fetch(url).result()
+        _name, ext = os.path.splitext(urlparse(url).path)
+        relpath = os.path.join(subpath, "{}{}".format(os.path.basename(cache_path), ext))
+        filepath = os.path.join(destpath, relpath)
+        if not os.path.exists(os.path.dirname(filepath)):
+            os.makedirs(os.path.dirname(filepath))
+
+        if not os.path.exists(filepath):
+            try:
+                os.link(cache_path, filepath)       # Avoid copying the file if the cache is on the same filesystem
+            except OSError:
+                # Copy through a temporary file so an existing link into the cache is never written to
+                tmp_path = "{}.{}.tmp".format(filepath, threading.get_ident())
+                shutil.copyfile(cache_path, tmp_path)
+                os.replace(tmp_path, filepath)
+        return relpath.replace(os.path.sep, "/")
+
+    def close(self):
+        """ Waits for any downloads to finish and saves the url index """
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            data = json.dumps(self.index, indent=2)
+        tmp_path = "{}.tmp".format(self.index_path)
+        with open(tmp_path, 'wb') as fobj:
+            fobj.write(data.encode('utf-8'))
+        os.replace(tmp_path, self.index_path)
@@ -13,9 +13,17 @@ from ricecooker.exceptions import raise_for_invalid_channel
 ###########################################################
 import logging
 import json
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from le_utils.constants import licenses, file_formats
 from bs4 import BeautifulSoup
 from selenium import webdriver
+try:
+    import cairosvg     # Converts svg covers without starting a browser (optional)
+except (ImportError, OSError):
+    cairosvg = None
 
 
 """ Run Constants"""
@@ -32,6 +40,7 @@ CHANNEL_THUMBNAIL = "https://pbs.twimg.com/profile_images/461533721493897216/Q-k
 ###########################################################
 
 BASE_URL = "https://openstax.org/api"
+MAX_REQUESTS = 8                        # Number of book details to read at once
 DOWNLOAD_DIRECTORY = "{}{}{}".format(os.path.dirname(os.path.realpath(__file__)), os.path.sep, "downloads")
 
 # Create download directory if it doesn't already exist
@@ -80,18 +89,19 @@ class MyChef(SushiChef):
 
         channel = self.get_channel(*args, **kwargs)             # Creates ChannelNode from data in self.channel_info
         contents = read_source()                                # Get json data from page
+        thumbnails = ThumbnailRenderer()                        # Renders book covers in the background
+        subject_nodes = {}                                      # Map of subjects to topic nodes
+        books = contents.get('books')
 
-        for book in contents.get('books'):
+        for book, content in zip(books, read_book_details(books)):
             subject = book.get('subject')
 
             # Get subject, add if not available
-            subject_node = next((child for child in channel.children if child.source_id == subject), None)
+            subject_node = subject_nodes.get(subject)
             if not subject_node:
-                subject_node = nodes.TopicNode(source_id=subject, title=subject)
+                subject_node = subject_nodes[subject] = nodes.TopicNode(source_id=subject, title=subject)
                 channel.add_child(subject_node)
 
-            content = read_source(endpoint=book.get('slug'))     # Read detailed page for content
-
             if not content:                                      # Skip to next item if nothing is found
                 continue
 
@@ -107,7 +117,6 @@ class MyChef(SushiChef):
             authors = authors + " et. al." if len(content['authors']) > 5 else authors
             details = {
                 "description": parse_description(content.get('description')),
-                "thumbnail": get_thumbnail(content.get('cover_url')),
                 "author": authors,
             }
 
@@ -117,27 +126,31 @@ class MyChef(SushiChef):
                 title=content.get('title'),
                 author=details.get('author'),
                 description=details.get('description'),
-                thumbnail=details.get('thumbnail'),
             )
             subject_node.add_child(book_node)
 
             # Create high resolution document
             LOGGER.info("   Writing {} documents...".format(book.get('title')))
             highres_title = "{} ({} Resolution)".format(content['title'], "High")
-            add_file_node(book_node, content.get("high_resolution_pdf_url"), highres_title, **auth_info, **details)
+            highres_node = add_file_node(book_node, content.get("high_resolution_pdf_url"), highres_title, **auth_info, **details)
 
             # Create low resolution document
             lowres_title = "{} ({} Resolution)".format(content['title'], "Low")
-            add_file_node(book_node, content.get("low_resolution_pdf_url"), lowres_title, **auth_info, **details)
+            lowres_node = add_file_node(book_node, content.get("low_resolution_pdf_url"), lowres_title, **auth_info, **details)
 
             # Create student handbook document
-            add_file_node(book_node, content.get("student_handbook_url"), "Student Handbook", **auth_info, **details)
+            handbook_node = add_file_node(book_node, content.get("student_handbook_url"), "Student Handbook", **auth_info, **details)
+
+            # The book and its documents use the cover as their thumbnail (set once it has been rendered)
+            for node in (book_node, highres_node, lowres_node, handbook_node):
+                thumbnails.add_thumbnail(node, content.get('cover_url'))
 
             # Parse resource materials
             LOGGER.info("   Writing {} resources...".format(book.get('title')))
             parse_resources("Instructor Resources", content.get('book_faculty_resources'), book_node, **auth_info)
             parse_resources("Student Resources", content.get('book_student_resources'), book_node, **auth_info)
 
+        thumbnails.finish()                                          # Wait for covers and set thumbnails
         raise_for_invalid_channel(channel)                           # Check for errors in channel construction
 
         return channel
@@ -146,21 +159,116 @@ class MyChef(SushiChef):
 """ Helper Methods """
 ###########################################################
 
-def read_source(endpoint="books"):
+def read_source(endpoint="books", baseurl=BASE_URL):
     """ Reads page source using downloader class to get json data """
-    page_contents = downloader.read("{baseurl}/{endpoint}".format(baseurl=BASE_URL, endpoint=endpoint))
+    page_contents = downloader.read("{baseurl}/{endpoint}".format(baseurl=baseurl, endpoint=endpoint))
     return json.loads(page_contents) # Open Stax url returns json object
 
-def get_thumbnail(url):
-    """ Reads page source using downloader class to get json data """
-    # Hacky method to get images, but much more lightweight than converting svg to png
-    filename, _ext = os.path.splitext(os.path.basename(url))
-    img_path = "{}{}{}.png".format(DOWNLOAD_DIRECTORY, os.path.sep, filename)
-    driver = webdriver.PhantomJS()
-    driver.set_script_timeout(30)
-    driver.get(url)
-    driver.save_screenshot(img_path)
-    return files.ThumbnailFile(path=img_path)
+def read_book_details(books, baseurl=BASE_URL, workers=MAX_REQUESTS):
+    """ Reads the detailed page for every book, a few at a time
+        Returns list of json data in the same order as books
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda book: read_source(endpoint=book.get('slug'), baseurl=baseurl), books))
+
+class ThumbnailRenderer(object):
+    """ Renders book covers to png thumbnails in the background
+
+        Covers are converted in-process with cairosvg if it is installed, otherwise
+        they are screenshotted by a small pool of PhantomJS drivers that are reused
+        between covers and quit when finished. Rendered thumbnails are named after
+        the sha1 of the cover, so a cover is only rendered once across runs, and
+        each cover url is only downloaded once per run.
+    """
+    def __init__(self, directory=DOWNLOAD_DIRECTORY, workers=4):
+        self.directory = directory
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.renders = {}               # Map of cover urls to futures
+        self.thumbnails = []            # List of (node, future)
+        self.idle_drivers = queue.Queue()
+        self.drivers = []               # All PhantomJS drivers that have been started
+
+    def render(self, url):
+        """ Starts rendering a cover if it hasn't been started already
+            Returns Future of path to png thumbnail
+        """
+        with self.lock:
+            if url not in self.renders:
+                self.renders[url] = self.executor.submit(self.render_cover, url)
+            return self.renders[url]
+
+    def render_cover(self, url):
+        """ Downloads a cover and converts it to a png if it's an svg (if it hasn't been converted already) """
+        content = downloader.read(url)
+        digest = hashlib.sha1(content).hexdigest()
+
+        # Tell the format from the content, since ricecooker uses the extension to tell the format and only
+        # accepts png and jpg thumbnails (other covers are skipped with a warning when finished)
+        ext = self.get_image_extension(content)
+        if not ext:
+            raise ValueError("{} is not a png, jpg or svg image".format(url))
+        img_path = "{}{}cover-{}{}".format(self.directory, os.path.sep, digest, ".png" if ext == ".svg" else ext)
+        if os.path.exists(img_path):
+            return img_path
+
+        tmp_path = "{}.{}.tmp".format(img_path, threading.get_ident())
+        if ext != ".svg":
+            with open(tmp_path, 'wb') as fobj:      # Already an image, so no need to convert it
+                fobj.write(content)
+        elif cairosvg:
+            cairosvg.svg2png(bytestring=content, write_to=tmp_path)
+        else:
+            svg_path = "{}{}cover-{}.svg".format(self.directory, os.path.sep, digest)
+            with open(svg_path, 'wb') as fobj:
+                fobj.write(content)
+            self.screenshot("file://{}".format(os.path.abspath(svg_path)), tmp_path)
+            os.remove(svg_path)
+        os.replace(tmp_path, img_path)
+        return img_path
+
+    def get_image_extension(self, content):
+        """ Returns the extension for an image from its first bytes (None if it isn't a png, jpg or svg) """
+        if content.lstrip().startswith(b"<"):
+            return ".svg"
+        if content.startswith(b"\xff\xd8"):
+            return ".jpg"
+        if content.startswith(b"\x89PNG"):
+            return ".png"
+        return None
+
+    def screenshot(self, url, img_path):
+        """ Screenshots a page with an idle PhantomJS driver (starting one if none are idle) """
+        try:
+            driver = self.idle_drivers.get_nowait()
+        except queue.Empty:
+            driver = webdriver.PhantomJS()
+            driver.set_script_timeout(30)
+            with self.lock:
+                self.drivers.append(driver)
+        try:
+            driver.get(url)
+            driver.save_screenshot(img_path)
+        finally:
+            self.idle_drivers.put(driver)
+
+    def add_thumbnail(self, node, url):
+        """ Sets the node's thumbnail to the cover at url once it has been rendered """
+        if url:
+            self.thumbnails.append((node, self.render(url)))
+
+    def finish(self):
+        """ Waits for covers to render, sets the thumbnails, and quits any PhantomJS drivers """
+        try:
+            for node, future in self.thumbnails:
+                try:
+                    node.set_thumbnail(files.ThumbnailFile(path=future.result()))
+                except Exception as e:
+                    LOGGER.warning("Unable to render thumbnail for {} ({})".format(node.title, e))
+        finally:
+            self.executor.shutdown(wait=True)
+            for driver in self.drivers:
+                driver.quit()
 
 def parse_description(description):
     """ Removes html tags from description """
@@ -177,6 +285,7 @@ def add_file_node(target_node, url, title, **details):
         **details
     )
     target_node.add_child(document_node)
+    return document_node
 
 def parse_resources(resource_name, resource_data, book_node, **auth_info):
     """ Creates resource topics """
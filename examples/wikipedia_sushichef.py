@@ -14,6 +14,9 @@ from ricecooker.exceptions import raise_for_invalid_channel
 import requests
 import tempfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from assetfetcher import AssetFetcher
 from le_utils.constants import licenses, file_formats
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -35,6 +38,7 @@ CHANNEL_THUMBNAIL = 'https://vignette2.wikia.nocookie.net/uncyclopedia/images/6/
 """ Additional Constants """
 ###########################################################
 BASE_URL = 'https://en.wikipedia.org/wiki'
+MAX_PAGES = 4                                               # Number of subpages to download at once
 
 # License to be used for content under channel
 CHANNEL_LICENSE = licenses.PUBLIC_DOMAIN
@@ -86,7 +90,11 @@ def create_topic(channel, title, endpoint):
     LOGGER.info('   Writing {} Folder...'.format(title))
     topic = nodes.TopicNode(source_id=endpoint, title=title)
     channel.add_child(topic)
-    add_subpages_from_wikipedia_list(topic, '{}/{}'.format(BASE_URL, endpoint))
+    fetcher = AssetFetcher()
+    try:
+        add_subpages_from_wikipedia_list(topic, '{}/{}'.format(BASE_URL, endpoint), fetcher=fetcher)
+    finally:
+        fetcher.close()
 
 def make_fully_qualified_url(url):
     """ Ensure url is qualified """
@@ -102,7 +110,7 @@ def read_source(url):
     html = downloader.read(url)
     return BeautifulSoup(html, "html.parser")
 
-def download_wikipedia_page(url, thumbnail, title):
+def download_wikipedia_page(url, thumbnail, title, fetcher=None):
     """ Create zip file to use for html pages """
     destpath = tempfile.mkdtemp()   # Create a temp directory to house our downloaded files
 
@@ -111,7 +119,7 @@ def download_wikipedia_page(url, thumbnail, title):
         url,
         destpath,
         filename="index.html",
-        middleware_callbacks=process_wikipedia_page,
+        middleware_callbacks=partial(process_wikipedia_page, fetcher=fetcher or AssetFetcher()),
     )
 
     zippath = create_predictable_zip(destpath)  # Turn the temp folder into a zip file
@@ -127,38 +135,43 @@ def download_wikipedia_page(url, thumbnail, title):
 
     return html5app
 
-def process_wikipedia_page(content, baseurl, destpath, **kwargs):
+def process_wikipedia_page(content, baseurl, destpath, fetcher=None, **kwargs):
     """ Saves images to html zip folder """
     page = BeautifulSoup(content, "html.parser")
+    fetcher = fetcher or AssetFetcher()
 
-    # Add style sheets to zip file
-    index = 0
+    # Find the style sheets and images to add to the zip file
+    assets = []                                 # List of (tag, attribute, subpath)
     for link in page.find_all("link"):
         if link.get('href') and link['href'].startswith('/'): # Import relative links
-            try:
-                subpath = "item_{}".format(index)
-                link["href"], _ = download_file(make_fully_qualified_url(link['href']), destpath, subpath=subpath)
-                index = index + 1
-            except Exception:
-                link["href"] = "#"
-
-    # Add images to zip file
+            assets.append((link, "href", "item_{}".format(len(assets))))
     for image in page.find_all("img"):
+        assets.append((image, "src", ""))
+
+    # Start all of the downloads before waiting on any of them
+    for tag, attribute, _subpath in assets:
+        try:
+            fetcher.fetch(make_fully_qualified_url(tag[attribute]))
+        except Exception:
+            pass
+
+    # Add style sheets and images to zip file
+    for tag, attribute, subpath in assets:
         try:
-            relpath, _ = download_file(make_fully_qualified_url(image["src"]), destpath)
-            image["src"] = relpath
+            tag[attribute] = fetcher.copy_to(make_fully_qualified_url(tag[attribute]), destpath, subpath=subpath)
         except Exception:
-            image["src"] = "#"
+            tag[attribute] = "#"
 
-    # Replace links with text to avoid broken links
-    content = str(page)
-    for link in page.find_all("a"):
-        if link.get('href') and not link['href'].startswith("#"):
-            content = content.replace(str(link), link.text)
+    unwrap_links(page)      # Replace links with text to avoid broken links
+    return str(page)
 
-    return content
+def unwrap_links(page):
+    """ Replaces links to other pages with their text (links to anchors on the page are kept) """
+    for link in page.find_all("a", href=True):
+        if not link['href'].startswith("#"):
+            link.replace_with(link.text)
 
-def add_subpages_from_wikipedia_list(topic, list_url):
+def add_subpages_from_wikipedia_list(topic, list_url, fetcher=None):
     """ add_subpages_from_wikipedia_list: Parses wiki pages and creates corresponding files
         To understand how the following parsing works, look at:
             1. the source of the page (e.g. https://en.wikipedia.org/wiki/List_of_citrus_fruits), or inspect in chrome dev tools
@@ -166,6 +179,9 @@ def add_subpages_from_wikipedia_list(topic, list_url):
     """
     page = read_source(list_url)        # Parse the the page into BeautifulSoup format, so we can loop through and manipulate it
     table = page.find("table")          # Extract the main table from the page
+    fetcher = fetcher or AssetFetcher()
+    page_executor = ThreadPoolExecutor(max_workers=MAX_PAGES)
+    subpages = []                       # List of futures for the HTML5 app nodes, in table order
 
     # Loop through all the rows in the table
     for row in table.find_all("tr"):
@@ -188,11 +204,13 @@ def add_subpages_from_wikipedia_list(topic, list_url):
         if thumbnail_url and not (thumbnail_url.endswith("jpg") or thumbnail_url.endswith("png")):
             thumbnail_url = None
 
-        # Download the wikipedia page into an HTML5 app node
-        html5app = download_wikipedia_page(url, thumbnail=thumbnail_url, title=title)
+        # Download the wikipedia page into an HTML5 app node (a few pages at a time)
+        subpages.append(page_executor.submit(download_wikipedia_page, url, thumbnail=thumbnail_url, title=title, fetcher=fetcher))
 
-        # Add the downloaded HTML5 app node into the topic
-        topic.add_child(html5app)
+    # Add the downloaded HTML5 app nodes into the topic
+    for subpage in subpages:
+        topic.add_child(subpage.result())
+    page_executor.shutdown()
 
 
 """ This code will run when the sushi chef is called from the command line. """
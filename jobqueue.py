@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+import json
+import os
+import socket
+import sqlite3
+import time
+
+
+class JobQueue(ABC):
+    """
+        The JobQueue object hands out book jobs (e.g. generating the index
+        or data file for a pdf) to workers. Workers claim a job, send
+        heartbeats while working on it, and report when it is finished.
+        Jobs whose worker stops sending heartbeats are handed out again.
+        The coordinator opens the queue while it is adding and waiting for
+        jobs, and closes it when they are done so workers know to stop
+    """
+    @abstractmethod
+    def reset_jobs(self):
+        """ Removes the jobs (along with their attempts, results and errors) left over from an earlier run """
+
+    @abstractmethod
+    def add_job(self, path, task):
+        """ Adds a job for a pdf unless it has already been added """
+
+    @abstractmethod
+    def claim_job(self, worker):
+        """ Returns the next pending job as a dict (None if there aren't any) and marks it as running """
+
+    @abstractmethod
+    def heartbeat(self, job_id, worker):
+        """ Records that the worker is still working on the job """
+
+    @abstractmethod
+    def finish_job(self, job_id, worker, result=None, error=None):
+        """ Records the result or error for a job """
+
+    @abstractmethod
+    def requeue_stale_jobs(self, timeout):
+        """ Hands out running jobs without a heartbeat within timeout seconds again """
+
+    @abstractmethod
+    def get_counts(self):
+        """ Returns dict of job status to number of jobs """
+
+    @abstractmethod
+    def get_failures(self):
+        """ Returns list of failed job dicts """
+
+    @abstractmethod
+    def set_open(self, is_open):
+        """ Marks the queue as open (the coordinator may still add jobs) or closed """
+
+    @abstractmethod
+    def is_open(self):
+        """ Returns True if the queue is open, False if it is closed, or None if no coordinator has opened it yet """
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+        JobQueue stored in a SQLite database, so it can be shared by workers
+        on different machines through a shared filesystem without running
+        a separate queue service
+    """
+    def __init__(self, path, max_attempts=3):
+        self.path = path                    # Path to database file
+        self.max_attempts = max_attempts    # Number of times to try a job before marking it as failed
+        if not os.path.exists(os.path.dirname(os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+
+        # Use the default rollback journal, since WAL mode doesn't work on network filesystems
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                task TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                heartbeat REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                UNIQUE (path, task)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+
+    def reset_jobs(self):
+        self.connection.execute("DELETE FROM jobs")
+
+    def add_job(self, path, task):
+        self.connection.execute("INSERT OR IGNORE INTO jobs (path, task) VALUES (?, ?)", (path, task))
+
+    def claim_job(self, worker):
+        # Lock the database while claiming so two workers can't claim the same job
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                self.connection.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                    (worker, time.time(), row['id'])
+                )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return dict(row, status='running', worker=worker, attempts=row['attempts'] + 1)
+
+    def heartbeat(self, job_id, worker):
+        self.connection.execute(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), job_id, worker)
+        )
+
+    def finish_job(self, job_id, worker, result=None, error=None):
+        if error is None:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL WHERE id = ? AND worker = ?",
+                (json.dumps(result), job_id, worker)
+            )
+        else:
+            # Try the job again unless it has run out of attempts
+            self.connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, error = ? "
+                "WHERE id = ? AND worker = ?",
+                (self.max_attempts, error, job_id, worker)
+            )
+
+    def requeue_stale_jobs(self, timeout):
+        cursor = self.connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+            "error = 'Worker ' || worker || ' stopped responding' "
+            "WHERE status = 'running' AND heartbeat < ?",
+            (self.max_attempts, time.time() - timeout)
+        )
+        return cursor.rowcount
+
+    def get_counts(self):
+        rows = self.connection.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+    def get_failures(self):
+        rows = self.connection.execute("SELECT * FROM jobs WHERE status = 'failed' ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def set_open(self, is_open):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES ('open', ?)", ('1' if is_open else '0',)
+        )
+
+    def is_open(self):
+        row = self.connection.execute("SELECT value FROM state WHERE key = 'open'").fetchone()
+        return None if row is None else row['value'] == '1'
+
+
+def get_worker_name():
+    """ Returns a name that identifies this worker process across machines """
+    return '{}-{}'.format(socket.gethostname(), os.getpid())
@@ -1,18 +1,21 @@
+from html import unescape
 from io import BytesIO
+import functools
+import hashlib
 import itertools
 import json
 import os
 import re
+import shutil
+import subprocess
 import tempfile
+import time
 
 from config import DOWNLOAD_DIRECTORY
 from PyPDF2 import PdfFileWriter, PdfFileReader
-from PyPDF2.generic import Destination, NullObject
-from PyPDF2.utils import PdfReadError
-from ricecooker.config import LOGGER
-from ricecooker.utils.downloader import read
-from ricecooker.classes import nodes
-from tika import parser
+from PyPDF2.generic import ArrayObject, Destination, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject
+from PyPDF2.pdf import PageObject
+from PyPDF2.utils import PdfReadError, b_
 
 # Monkeypatched PyPDF2.PdfFileReader
 class CustomDestination(Destination):
@@ -29,6 +32,236 @@ class CustomPDFReader(PdfFileReader):
         return CustomDestination(title, page, typ, *array)
 
 
+TIKA_TIMEOUT = 300      # Seconds to wait for tika to read a file before giving up
+
+class TikaError(RuntimeError):
+    """ Raised when tika returns an error instead of a file's text (e.g. while its server is restarting) """
+
+def read_with_tika(data, xml=False):
+    """
+        Reads the text of a pdf with tika
+        Args:
+            - data (file-like or bytes) pdf to read
+            - xml (bool) return tika's xhtml output instead of plain text (optional)
+        Returns str text (None if the pdf doesn't have any)
+
+        ---
+
+        Note: tika's parser functions don't raise when the server returns an error
+        status, and don't take a request timeout, so the server is called directly
+    """
+    import requests  # Installed with tika
+    from tika import parser, tika  # Imported here since tika sets up its client on import
+
+    http_verbs = {'put': functools.partial(requests.put, timeout=TIKA_TIMEOUT)}
+    status, response = tika.callServer('put', tika.ServerEndpoint, '/rmeta/xml' if xml else '/rmeta/text', data,
+                                       {'Accept': 'application/json'}, False, httpVerbs=http_verbs)
+    if status != 200:
+        raise TikaError('tika returned status {}'.format(status))
+    try:
+        return parser._parse((status, response)).get('content')
+    except ValueError as e:
+        raise TikaError('tika returned invalid json ({})'.format(str(e)))
+
+
+class SharedObjectPool(object):
+    """
+        The SharedObjectPool object keeps the serialized bytes of pdf objects
+        (e.g. fonts and images) that are used by more than one split pdf, so
+        they only need to be encoded once per book
+    """
+    def __init__(self):
+        self.seen = {}          # Map of id(obj) to obj for objects written once
+        self.serialized = {}    # Map of id(obj) to (obj, bytes) for objects written more than once
+        self.leaves = {}        # Map of id(obj) to whether obj has no indirect references
+
+    def is_leaf(self, obj):
+        """
+            Checks if an object can be serialized the same way in any pdf (i.e. doesn't reference other objects)
+            Args: obj (PdfObject) object to check
+            Returns boolean indicating if obj has no indirect references
+        """
+        if id(obj) not in self.leaves:
+            self.leaves[id(obj)] = not self.has_references(obj)
+        return self.leaves[id(obj)]
+
+    def has_references(self, obj):
+        if isinstance(obj, IndirectObject):
+            return True
+        if isinstance(obj, DictionaryObject):
+            return any(self.has_references(v) for v in obj.values())
+        if isinstance(obj, ArrayObject):
+            return any(self.has_references(v) for v in obj)
+        return False
+
+    def get_bytes(self, obj):
+        """
+            Returns the serialized bytes for an object, reusing them if the object has been written before
+            Args: obj (PdfObject) object to serialize
+            Returns tuple of (bytes, boolean indicating if bytes were reused)
+        """
+        if id(obj) in self.serialized:
+            return self.serialized[id(obj)][1], True
+
+        data = BytesIO()
+        obj.writeToStream(data, None)
+
+        # Only hold on to the bytes once the object has been shared with another pdf
+        if self.is_leaf(obj):
+            if id(obj) in self.seen:
+                self.serialized[id(obj)] = (self.seen.pop(id(obj)), data.getvalue())
+            else:
+                self.seen[id(obj)] = obj
+        return data.getvalue(), False
+
+
+class PooledPdfFileWriter(PdfFileWriter):
+    """
+        PdfFileWriter that writes objects shared between split pdfs from a SharedObjectPool
+        (based on PyPDF2 1.26.0 PdfFileWriter.write)
+    """
+    def __init__(self, pool, deduplicate=False):
+        super(PooledPdfFileWriter, self).__init__()
+        self.pool = pool
+        self.deduplicate = deduplicate      # Write identical objects only once
+        self.reused_bytes = 0
+
+    def remove_duplicates(self):
+        """
+            Points references to identical objects at a single copy and blanks out the others
+            Args: None
+            Returns None
+        """
+        copies = {}         # Map of serialized bytes to the idnum of the first copy
+        duplicates = {}     # Map of duplicate idnums to the idnum of the first copy
+        for idnum, obj in enumerate(self._objects, 1):
+            if obj is None or not self.pool.is_leaf(obj):
+                continue
+            data = BytesIO()
+            obj.writeToStream(data, None)
+            duplicates[idnum] = copies.setdefault(data.getvalue(), idnum)
+        duplicates = {k: v for k, v in duplicates.items() if k != v}
+
+        def replace_references(data):
+            items = data.items() if isinstance(data, DictionaryObject) else enumerate(data)
+            for key, value in list(items):
+                if isinstance(value, IndirectObject) and value.pdf is self and value.idnum in duplicates:
+                    data[key] = IndirectObject(duplicates[value.idnum], 0, self)
+                elif isinstance(value, (DictionaryObject, ArrayObject)):
+                    replace_references(value)
+
+        for idnum, obj in enumerate(self._objects, 1):
+            if idnum in duplicates:
+                self._objects[idnum - 1] = NullObject()
+            elif isinstance(obj, (DictionaryObject, ArrayObject)):
+                replace_references(obj)
+
+    def write(self, stream):
+        if not self._root:
+            self._root = self._addObject(self._root_object)
+
+        # Point references to pages back to the pages in this pdf (see PdfFileWriter.write)
+        externalReferenceMap = {}
+        for objIndex, obj in enumerate(self._objects):
+            if isinstance(obj, PageObject) and obj.indirectRef is not None:
+                data = obj.indirectRef
+                externalReferenceMap.setdefault(data.pdf, {}).setdefault(data.generation, {})[data.idnum] = IndirectObject(objIndex + 1, 0, self)
+
+        self.stack = []
+        self._sweepIndirectReferences(externalReferenceMap, self._root)
+        del self.stack
+
+        if self.deduplicate:
+            self.remove_duplicates()
+
+        # Write objects, using the pool for any objects that have been written before
+        object_positions = []
+        stream.write(self._header + b_("\n"))
+        for idnum, obj in enumerate(self._objects, 1):
+            object_positions.append(stream.tell())
+            stream.write(b_(str(idnum) + " 0 obj\n"))
+            data, reused = self.pool.get_bytes(obj)
+            stream.write(data)
+            self.reused_bytes += len(data) if reused else 0
+            stream.write(b_("\nendobj\n"))
+
+        # Write xref table
+        xref_location = stream.tell()
+        stream.write(b_("xref\n"))
+        stream.write(b_("0 %s\n" % (len(self._objects) + 1)))
+        stream.write(b_("%010d %05d f \n" % (0, 65535)))
+        for offset in object_positions:
+            stream.write(b_("%010d %05d n \n" % (offset, 0)))
+
+        # Write trailer
+        stream.write(b_("trailer\n"))
+        trailer = DictionaryObject()
+        trailer.update({
+            NameObject("/Size"): NumberObject(len(self._objects) + 1),
+            NameObject("/Root"): self._root,
+            NameObject("/Info"): self._info,
+        })
+        trailer.writeToStream(stream, None)
+        stream.write(b_("\nstartxref\n%s\n%%%%EOF\n" % (xref_location)))
+
+
+class HashingWriter(object):
+    """
+        The HashingWriter object wraps a file and computes the md5 of
+        everything written to it, so a split pdf can be hashed as it is
+        written rather than read back afterwards
+    """
+    def __init__(self, fobj):
+        self.fobj = fobj
+        self.md5 = hashlib.md5()
+
+    def write(self, data):
+        self.md5.update(data)
+        return self.fobj.write(data)
+
+    def tell(self):
+        return self.fobj.tell()
+
+    def hexdigest(self):
+        return self.md5.hexdigest()
+
+
+class ExerciseQuestion(object):
+    """
+        The ExerciseQuestion object is a compact version of the question
+        dicts in -data.json files, with the answers already split into
+        the lists ricecooker's question classes expect
+    """
+    __slots__ = ('question', 'type', 'correct_answers', 'all_answers')
+
+    def __init__(self, question, type, answers):
+        self.question = question
+        self.type = type
+        self.correct_answers = []
+        self.all_answers = []
+        for answer, correct in answers.items():
+            self.all_answers.append(answer)
+            if correct:
+                self.correct_answers.append(answer)
+
+    def __getstate__(self):
+        return (self.question, self.type, self.correct_answers, self.all_answers)
+
+    def __setstate__(self, state):
+        self.question, self.type, self.correct_answers, self.all_answers = state
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+            Used as a json object_hook to load questions straight into ExerciseQuestion objects
+            Args: data (dict) json object
+            Returns ExerciseQuestion if data is a question, otherwise data
+        """
+        if 'question' in data and 'type' in data and isinstance(data.get('answers'), dict):
+            return cls(data['question'], data['type'], data['answers'])
+        return data
+
+
 class Chapter(object):
     """
         The Chapter object is a class to help with
@@ -40,6 +273,7 @@ class Chapter(object):
         self.text = text.strip()
         self.children = []
         self.start = start
+        self.name_counts = {}   # Map of child names to how many times they have been added
 
     def to_dict(self):
         if self.start:
@@ -61,8 +295,10 @@ class Chapter(object):
 
     def add_child(self, text, start=None):
         # Chapters at the same level must have a unique name or they will write to the same key
-        if any(c for c in self.children if c.text == text):
-            text = "{} ({})".format(text, len([c for c in self.children if c.text == text]))
+        count = self.name_counts.get(text, 0)
+        self.name_counts[text] = count + 1
+        if count:
+            text = "{} ({})".format(text, count)
 
         chapter = Chapter(text, start=start)
 
@@ -70,6 +306,56 @@ class Chapter(object):
         return chapter
 
 
+class ChapterJournal(object):
+    """
+        The ChapterJournal object records each chapter as it is finished so
+        an interrupted generate_data_file run can pick up where it left off
+        instead of splitting and reading every chapter again
+    """
+    def __init__(self, path):
+        self.path = path            # Path to journal file
+        self.entries = {}           # Map of (folder, chapter) to chapter data
+
+        # Read chapters finished by previous runs
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as fobj:
+                for line in fobj:
+                    try:
+                        entry = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        continue  # The last line may be incomplete if the run was interrupted
+                    self.entries[(entry.pop('folder'), entry['chapter'])] = entry
+
+    def get(self, folder, chapter):
+        """
+            Returns the finished chapter data or None if the chapter hasn't been finished
+            Args:
+                - folder (str) folder the chapter is saved under
+                - chapter (str) name of chapter
+            Returns dict of chapter data
+        """
+        return self.entries.get((folder, chapter))
+
+    def add(self, folder, data):
+        """
+            Appends finished chapter data to the journal
+            Args:
+                - folder (str) folder the chapter is saved under
+                - data (dict) chapter data (see get_data_file docstring for sample)
+            Returns None
+        """
+        self.entries[(folder, data['chapter'])] = data
+        with open(self.path, 'ab') as fobj:
+            fobj.write(json.dumps(dict(data, folder=folder), ensure_ascii=False).encode('utf-8') + b'\n')
+            fobj.flush()
+            os.fsync(fobj.fileno())
+
+    def remove(self):
+        """ Deletes the journal file once the -data.json file has been written """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class PDFParser(object):
     # Path to download split pdfs to
     path = None
@@ -82,9 +368,23 @@ class PDFParser(object):
         'Guía para maestros -',
     ]
 
-    def __init__(self, url_or_path, directory=DOWNLOAD_DIRECTORY):
+    # Patterns used to read index pages
+    roman_numeral_pattern = re.compile(r"[IVX]+")
+    non_digit_pattern = re.compile(r"\D")
+
+    # Matches the operator that begins a text object in a content stream (all text is drawn between BT and ET)
+    text_operator_pattern = re.compile(br"(?<![^\s()<>\[\]{}/%])BT(?![^\s()<>\[\]{}/%])")
+
+    def __init__(self, url_or_path, directory=DOWNLOAD_DIRECTORY, optimize=False, catalog=None, stage=False, profiler=None):
         self.directory = directory          # Store split pdfs here
+        self.optimize = optimize            # Compress and linearize split pdfs
+        self.stage = stage                  # Link split pdfs into ricecooker's storage
+        self.file_digests = {}              # Map of split pdf paths to md5 of the bytes written
+        self.catalog = catalog              # Catalog to record index and data files in (optional)
+        self.profiler = profiler            # Profiler to mark stages with (optional)
         self.download_url = url_or_path     # Where to read pdf from
+        self.ignore_strings = None          # strings_to_ignore that ignore_pattern was built from
+        self.ignore_pattern = None          # Pattern matching any of strings_to_ignore
 
         filename, _ = os.path.splitext(os.path.basename(url_or_path))
 
@@ -94,6 +394,9 @@ class PDFParser(object):
         # Path to -data.json file
         self.pdf_data_path = os.path.sep.join([os.path.dirname(url_or_path), '{}-data.json'.format(filename)])
 
+        # Path to journal of chapters finished while generating the -data.json file
+        self.journal_path = os.path.sep.join([os.path.dirname(url_or_path), '{}-data.journal'.format(filename)])
+
     def __enter__(self):
         """ Called when opening context (e.g. with HTMLWriter() as writer: ) """
         self.open()
@@ -117,6 +420,10 @@ class PDFParser(object):
 
         self.file = open(self.download_url, 'rb')
         self.pdf = CustomPDFReader(self.file)
+        self.page_texts = {}                # Cache of page text read from tika
+        self.text_pages = {}                # Cache of whether pages have any text to read
+        self.skipped_pages = set()          # Pages without text that weren't sent to tika
+        self.object_pool = SharedObjectPool()   # Fonts, images, etc. shared between split pdfs
 
     def close(self):
         """ Closes main pdf file when done
@@ -144,17 +451,121 @@ class PDFParser(object):
             https://stackoverflow.com/questions/35090948/pypdf2-wont-extract-all-text-from-pdf
             (Also avoiding pdftotext as it requires poppler installation)
         """
-        tmppdf = BytesIO()
-        writer = PdfFileWriter()
-        writer.addPage(self.pdf.getPage(index))
-        writer.write(tmppdf)
-        tmppdf.seek(0)
-        return parser.from_buffer(tmppdf)['content']
+        if index not in self.page_texts and not self.has_text(index):
+            self.skipped_pages.add(index)
+            self.page_texts[index] = ''
+        if index not in self.page_texts:
+            tmppdf = BytesIO()
+            writer = PdfFileWriter()
+            writer.addPage(self.pdf.getPage(index))
+            writer.write(tmppdf)
+            tmppdf.seek(0)
+            self.page_texts[index] = read_with_tika(tmppdf)
+        return self.page_texts[index]
+
+    def get_pages_text(self, pages):
+        """
+            Reads the text of multiple pages with a single tika request
+            Args: pages (iterable) page numbers to read
+            Returns list of str page text in the same order as pages
+
+            ---
+
+            Note: tika's xhtml output wraps each page in a <div class="page">,
+            so we can write all of the pages to one pdf in memory and split the
+            text back up afterwards (see get_page_text for why this is needed)
+        """
+        pages = list(pages)
+        for index in pages:
+            if index not in self.page_texts and not self.has_text(index):
+                self.skipped_pages.add(index)
+                self.page_texts[index] = ''
+        missing = [index for index in pages if index not in self.page_texts]
+
+        if missing:
+            tmppdf = BytesIO()
+            writer = PdfFileWriter()
+            for index in missing:
+                writer.addPage(self.pdf.getPage(index))
+            writer.write(tmppdf)
+            tmppdf.seek(0)
+            page_texts = self.split_xhtml_pages(read_with_tika(tmppdf, xml=True) or '')
+
+            # Fall back to reading pages one at a time if the pages couldn't be matched up
+            if len(page_texts) != len(missing):
+                print('WARNING: Unable to split text for {} by page, reading pages individually'.format(self.download_url))
+                return [self.get_page_text(index) for index in pages]
+            self.page_texts.update(zip(missing, page_texts))
+
+        return [self.page_texts[index] for index in pages]
+
+    def has_text(self, index):
+        """
+            Checks if a page has any text for tika to read
+            Args: index (int) page number to check
+            Returns boolean indicating if page draws any text
+
+            ---
+
+            Note: scanned pages (a single image) and blank pages don't have a text
+            layer, so sending them to tika costs a full request for no text. Text
+            can only be drawn inside a text object (BT ... ET), so we look for the
+            BT operator in the page's content stream and in any forms it draws.
+            If the page can't be read, it's assumed to have text.
+        """
+        if index not in self.text_pages:
+            try:
+                page = self.pdf.getPage(index)
+                self.text_pages[index] = self.stream_has_text(page.get('/Contents'), page.get('/Resources'))
+            except Exception:
+                self.text_pages[index] = True
+        return self.text_pages[index]
+
+    def stream_has_text(self, contents, resources, visited=None):
+        """
+            Checks if a content stream or any of the forms it uses has a text object
+            Args:
+                - contents (PdfObject) content stream or array of content streams
+                - resources (PdfObject) resource dictionary for the content stream
+                - visited (set) ids of forms that have already been checked (optional)
+            Returns boolean indicating if stream draws any text
+        """
+        visited = visited if visited is not None else set()
+        contents = contents.getObject() if contents is not None else None
+        streams = contents if isinstance(contents, ArrayObject) else [contents] if contents is not None else []
+        for stream in streams:
+            if self.text_operator_pattern.search(stream.getObject().getData()):
+                return True
+
+        # Text may also be drawn by forms (reusable content streams) in the resources
+        resources = resources.getObject() if resources is not None else {}
+        xobjects = resources.get('/XObject')
+        for xobject in (xobjects.getObject().values() if xobjects is not None else []):
+            if isinstance(xobject, IndirectObject):
+                if xobject.idnum in visited:
+                    continue
+                visited.add(xobject.idnum)
+            form = xobject.getObject()
+            if form.get('/Subtype') == '/Form' and self.stream_has_text(form, form.get('/Resources'), visited):
+                return True
+        return False
+
+    def split_xhtml_pages(self, content):
+        """
+            Splits tika's xhtml output into the text for each page
+            Args: content (str) xhtml returned by tika
+            Returns list of str page text
+        """
+        page_texts = []
+        for page in content.split('<div class="page">')[1:]:
+            text = re.sub(r"</p>|<br\s*/?>", "\n", page)
+            page_texts.append(unescape(re.sub(r"<[^>]+>", "", text)))
+        return page_texts
 
-    def get_data_file(self):
+    def get_data_file(self, compact=False):
         """
             Reads and returns the -data.json file data
-            Args: None
+            Args: compact (bool) load questions as ExerciseQuestion objects (optional)
             Returns dict of pdf data
 
             ---
@@ -190,11 +601,11 @@ class PDFParser(object):
             raise OSError('Unable to find data file for {}. Please run scripts/generatedata.py command and try again.'.format(self.download_url))
 
         # Try reading the -data.json file
-        with open(self.pdf_data_path, 'rb') as fobj:
-            try:
-                return json.loads(fobj.read())
-            except Exception as e:
-                raise OSError('{} is invalid ({}).\n\nPlease edit file and try again'.format(self.pdf_data_path, str(e)))
+        try:
+            with open(self.pdf_data_path, 'rb') as fobj:
+                return json.loads(fobj.read().decode('utf-8'), object_hook=ExerciseQuestion.from_dict if compact else None)
+        except Exception as e:
+            raise OSError('{} is invalid ({}).\n\nPlease edit file and try again'.format(self.pdf_data_path, str(e)))
 
 
     # -index.json file generation code
@@ -205,17 +616,29 @@ class PDFParser(object):
             Args: text (str) chapter name to validate
             Returns boolean indicating if chapter name is valid
         """
-        return text.strip() and not any(t for t in self.strings_to_ignore if t in text)
+        return text.strip() and not self.get_ignore_pattern().search(text)
+
+    def get_ignore_pattern(self):
+        """
+            Returns a pattern matching any of strings_to_ignore, built again if they have changed (e.g. set for one book)
+            Args: None
+            Returns compiled regular expression
+        """
+        if self.ignore_strings != self.strings_to_ignore:
+            self.ignore_strings = list(self.strings_to_ignore)
+            # (?!) never matches, so nothing is ignored if there are no strings
+            self.ignore_pattern = re.compile('|'.join(re.escape(t) for t in self.strings_to_ignore) or '(?!)')
+        return self.ignore_pattern
 
     def get_index_range(self, index_delimiter):
         current_page = None
-        index_start = 0
+        index = 0
 
         # Find the index page by searching for a series of delimiters
         # (using multiple in case the character is common)
         index_str = index_delimiter * 5
-        for index in range(0, 20):  # Index is generally within the first 10 pages
-            current_page = self.get_page_text(index)
+        search_pages = range(0, min(20, self.pdf.numPages))  # Index is generally within the first 10 pages
+        for index, current_page in zip(search_pages, self.get_pages_text(search_pages)):
             if current_page and index_str in current_page.replace(' ', ''):
                 break
         index_start = index
@@ -253,10 +676,14 @@ class PDFParser(object):
                     }
                 }
         """
-        # Don't overwrite the file if it already exists
+        # Don't overwrite the file if it already exists, unless the pdf has changed since it was generated
         if os.path.exists(self.index_path):
-            print('-- Found index at {}'.format(self.index_path))
-            return self.index_path
+            if os.path.getmtime(self.index_path) >= os.path.getmtime(self.download_url):
+                print('-- Found index at {}'.format(self.index_path))
+                return self.index_path
+
+            # Keep the old -index.json file so any edited chapters can be copied over
+            self.backup_file(self.index_path)
 
         root_chapter = Chapter(self.download_url)
         current_page = None
@@ -270,65 +697,75 @@ class PDFParser(object):
 
         # Read through all index pages and extract chapter information
         current_section = None
-        for pagenum in range(index_start, index_end):
-            current_page = self.get_page_text(pagenum)
-            chapters = [c for c in current_page.split('\n') if self.is_valid_chapter(c)]
-
-            # When there are columns in the index, the page numbers sometimes end up on
-            # separate lines. Use this to help unify the chapters
-            page_number_index = 0
-            page_numbers = sorted([int(num) for num in chapters if num.isdigit()])
-
-            # Read chapters in the list of chapters found on this page
-            for chapter in chapters:
-                chapter_texts = chapter.split(index_delimiter)
-                chapter_title = chapter_texts[0].replace('…', '').strip()
-
-                # Skip over if chapter is blank, is a page range (e.g. 5-10), or roman numerals (e.g. III)
-                if chapter_title.replace('-', '').isdigit() or not chapter.strip() or re.match(r"[IVX]+", chapter):
-                    continue
-
-                # If there are no index delimiters, this is a section
-                # Set current_section for future chapters to fall under
-                elif len(chapter_texts) == 1:
-                    print('-- {}'.format(chapter_title))
-                    current_section = root_chapter.add_child(chapter_title)
-                    continue
-
-                # Chapter has index delimiter, but no page number
-                # Match with the page_numbers to assign a page number
-                elif not chapter_texts[-1].strip() or any(c for c in chapter_texts[-1] if c.isalpha()):
-                    try:
-                        chapter_title = "{} {}".format(chapter_texts[-1].replace('…', '').strip(), chapter_title)
-                        page_number = page_numbers[page_number_index]
-                        page_number_index += 1
-                    except IndexError:
-                        print('WARNING: Unable to parse {}'.format(chapter))
-
-                # Chapter has index delimiter and page number
-                # Assign page number to chapter name
-                else:
-                    try:
-                        page_number = int(''.join([c for c in chapter_texts[-1].split('-')[0] if c.isdigit()]))
-                    except ValueError:
-                        # If the last item isn't a page number, use the flat
-                        # page list to determine the correct page number
-                        chapter_title = "{} {}".format(chapter_texts[-1].replace('…', '').strip(), chapter_title)
-                        page_number = page_numbers[page_number_index]
-                        page_number_index += 1
-
-                # Add the chapter to the current_section
-                current_section = current_section or root_chapter
-                current_section.add_child(chapter_title, start=page_number)
-                print('---- {} {} {}'.format(chapter_title, index_delimiter * 5, page_number))
+        for current_page in self.get_pages_text(range(index_start, index_end)):
+            current_section = self.parse_index_page(current_page, index_delimiter, root_chapter, current_section)
+        if self.profiler:
+            self.profiler.stage('index')
 
         # Write -index.json file
         with open(self.index_path, 'wb') as fobj:
             fobj.write(json.dumps(root_chapter.to_dict(), indent=4, ensure_ascii=False).encode('utf-8'))
+        if self.catalog:
+            self.catalog.save_index(self)
 
         return self.index_path
 
 
+    def parse_index_page(self, text, index_delimiter, root_chapter, current_section=None):
+        """
+            Adds the sections and chapters listed on an index page
+            Args:
+                - text (str) index page text
+                - index_delimiter (str) character that is used to separate chapter names and page numbers
+                - root_chapter (Chapter) chapter to add sections and chapters to
+                - current_section (Chapter) section from the previous page for chapters to fall under (optional)
+            Returns Chapter section for the next page's chapters to fall under
+        """
+        chapters = [c for c in text.split('\n') if self.is_valid_chapter(c)]
+
+        # When there are columns in the index, the page numbers sometimes end up on
+        # separate lines. Use these (in order) for chapters that don't have a page number
+        page_numbers = iter(sorted(int(num) for num in chapters if num.isdigit()))
+
+        # Read chapters in the list of chapters found on this page
+        for chapter in chapters:
+            chapter_texts = chapter.split(index_delimiter)
+            chapter_title = chapter_texts[0].replace('…', '').strip()
+            page_text = chapter_texts[-1]
+
+            # Skip over if chapter is a page range (e.g. 5-10) or roman numerals (e.g. III)
+            if chapter_title.replace('-', '').isdigit() or self.roman_numeral_pattern.match(chapter):
+                continue
+
+            # If there are no index delimiters, this is a section
+            # Set current_section for future chapters to fall under
+            elif len(chapter_texts) == 1:
+                print('-- {}'.format(chapter_title))
+                current_section = root_chapter.add_child(chapter_title)
+                continue
+
+            # Chapter has index delimiter and page number
+            # Assign page number to chapter name
+            digits = self.non_digit_pattern.sub('', page_text.split('-')[0])
+            if page_text.strip() and digits and not any(c for c in page_text if c.isalpha()):
+                page_number = int(digits)
+
+            # Chapter has index delimiter, but no page number
+            # Match with the page_numbers to assign a page number
+            else:
+                chapter_title = "{} {}".format(page_text.replace('…', '').strip(), chapter_title)
+                page_number = next(page_numbers, None)
+                if page_number is None:
+                    print('WARNING: Unable to parse {}'.format(chapter))
+                    continue
+
+            # Add the chapter to the current_section
+            current_section = current_section or root_chapter
+            current_section.add_child(chapter_title, start=page_number)
+            print('---- {} {} {}'.format(chapter_title, index_delimiter * 5, page_number))
+
+        return current_section
+
     # -data.json file generation code
     #######################################################################################################
     def get_filename(self, text):
@@ -349,6 +786,159 @@ class PDFParser(object):
             if isinstance(v, dict) else [v] for k, v in data.items()
         ]))
 
+    def read_index_file(self):
+        """
+            Reads and returns the -index.json file data
+            Args: None
+            Returns dict of index data (see generate_index_file docstring for sample)
+        """
+        # Raise an error if there isn't a corresponding -index.json file
+        if not os.path.exists(self.index_path):
+            raise OSError('Unable to find index file for {}. Please run scripts/generateindex.py command and try again.'.format(self.download_url))
+
+        # Read the index data
+        with open(self.index_path, 'rb') as fobj:
+            try:
+                return json.loads(fobj.read())
+            except Exception as e:
+                raise OSError('{} is invalid ({}). Please edit file and try again'.format(self.index_path, str(e)))
+
+    def get_page_ranges(self, chapter_data, offset, pages, folder=''):
+        """
+            Determines which pages each split pdf will contain
+            Args:
+                - chapter_data (dict) index data for chapters
+                - offset (int) difference between first page number and where first page actually starts
+                - pages (iterator) sorted page numbers (used to get where chapter ends)
+                - folder (str) name of folder to save pdfs under (important if chapters have the same name)
+            Returns list of page range data
+
+            ---
+
+            Sample page range data (start is inclusive and end is exclusive, both zero-based):
+              [
+                {
+                  "header": "Section Name",
+                  "chapters": [
+                    {"chapter": "Chapter 1", "start": 6, "end": 11, "folder": "Section-Name"}
+                  ]
+                }
+              ]
+        """
+        page_ranges = []
+
+        # Iterate through chapter_data
+        for title, data in chapter_data.items():
+            # Sections hold their own list of chapters
+            if isinstance(data, dict):
+                page_ranges.append({
+                    "header": title,
+                    "chapters": self.get_page_ranges(data, offset, pages, folder=title)
+                })
+
+            # Chapters end where the next page number in the index starts
+            else:
+                try:
+                    end = next(pages) - 1 + offset
+                except StopIteration:
+                    end = self.pdf.numPages
+
+                page_ranges.append({
+                    "chapter": title,
+                    "start": data - 1 + offset,
+                    "end": end,
+                    "folder": self.get_filename(folder),
+                })
+        return page_ranges
+
+    def get_index_page_ranges(self):
+        """
+            Reads the -index.json file and determines the split pdf page ranges
+            Args: None
+            Returns list of page range data (see get_page_ranges docstring for sample)
+        """
+        chapter_data = self.read_index_file()
+
+        # Get flat list of page numbers
+        next_pages = iter(sorted(self.flatten_dict(chapter_data['chapters']))[1:])
+        return self.get_page_ranges(chapter_data['chapters'], chapter_data['offset'], next_pages)
+
+    def plan_data_file(self, check_text=False):
+        """
+            Reports what generate_data_file would do without splitting any pdfs or calling tika
+            Args: check_text (bool) check every page for a text layer to count the pages that won't be sent to tika (optional)
+            Returns dict of plan data
+
+            ---
+
+            Sample plan data (start is inclusive and end is exclusive, both zero-based;
+            without check_text, text_free_pages is None and tika_calls counts every chapter with pages):
+              {
+                "pdf": "path/to/file.pdf",
+                "pages": 120,
+                "split_pages": 110,
+                "tika_calls": 2,
+                "text_free_pages": 4,
+                "chapters": [
+                  {"section": "Section Name", "chapter": "Chapter 1", "start": 6, "end": 11},
+                  {"section": "Section Name", "chapter": "Chapter 2", "start": 11, "end": 120}
+                ],
+                "errors": []
+              }
+        """
+        chapters = []
+        errors = []
+
+        # Flatten the page ranges so they can be checked against each other
+        def add_chapters(page_ranges, section=None):
+            for item in page_ranges:
+                if 'header' in item:
+                    add_chapters(item['chapters'], section=item['header'])
+                else:
+                    chapters.append({
+                        "section": section,
+                        "chapter": item['chapter'],
+                        "start": item['start'],
+                        "end": item['end'],
+                    })
+        add_chapters(self.get_index_page_ranges())
+
+        # Check for ranges that would produce broken or missing pdfs
+        for chapter in chapters:
+            if chapter['end'] <= chapter['start']:
+                errors.append('{} has an empty page range ({}-{})'.format(chapter['chapter'], chapter['start'] + 1, chapter['end']))
+            if chapter['start'] < 0 or chapter['end'] > self.pdf.numPages:
+                errors.append('{} is out of bounds ({}-{} of {} pages)'.format(chapter['chapter'], chapter['start'] + 1, chapter['end'], self.pdf.numPages))
+
+        # Check for ranges that share pages
+        previous = None
+        for chapter in sorted(chapters, key=lambda c: (c['start'], c['end'])):
+            if previous and chapter['start'] < previous['end'] and chapter['end'] > chapter['start']:
+                errors.append('{} overlaps with {} ({}-{} and {}-{})'.format(
+                    chapter['chapter'], previous['chapter'],
+                    chapter['start'] + 1, chapter['end'], previous['start'] + 1, previous['end']
+                ))
+            if not previous or chapter['end'] > previous['end']:
+                previous = chapter
+
+        # Chapters without any text aren't sent to tika (checking every page reads
+        # every content stream in the pdf, so it's only done if asked for)
+        def get_pages(chapter):
+            return range(max(chapter['start'], 0), min(chapter['end'], self.pdf.numPages))
+        text_free_pages = set()
+        if check_text:
+            text_free_pages = {index for chapter in chapters for index in get_pages(chapter) if not self.has_text(index)}
+
+        return {
+            "pdf": self.download_url,
+            "pages": self.pdf.numPages,
+            "split_pages": sum(max(c['end'] - c['start'], 0) for c in chapters),
+            "tika_calls": sum(1 for c in chapters if any(index not in text_free_pages for index in get_pages(c))),
+            "text_free_pages": len(text_free_pages) if check_text else None,
+            "chapters": chapters,
+            "errors": errors,
+        }
+
     def generate_data_file(self):
         """
             Generates the -data.json file
@@ -366,66 +956,121 @@ class PDFParser(object):
             print('-- Found data file at {}'.format(self.pdf_data_path))
             return self.pdf_data_path
 
-        # Raise an error if there isn't a corresponding -index.json file
-        if not os.path.exists(self.index_path):
-            raise OSError('Unable to find index file for {}. Please run scripts/generateindex.py command and try again.'.format(self.download_url))
+        # Resume from any chapters finished by a previous run
+        journal = ChapterJournal(self.journal_path)
+        if journal.entries:
+            print('-- Resuming with {} finished chapters from {}'.format(len(journal.entries), self.journal_path))
+
+        # Write pdf data to -data.json path (through a temporary file so a partial file is never left behind)
+        page_ranges = self.get_index_page_ranges()
+        pdf_data = self.write_pdf(page_ranges, journal=journal)
+        data_json = json.dumps(pdf_data, indent=2, ensure_ascii=False)
+        tmp_path = '{}.tmp'.format(self.pdf_data_path)
+        with open(tmp_path, 'wb') as fobj:
+            fobj.write(data_json.encode('utf-8'))
+        os.replace(tmp_path, self.pdf_data_path)
+        journal.remove()
+        if self.skipped_pages:
+            print('-- Skipped {} pages without text (not sent to tika)'.format(len(self.skipped_pages)))
+
+        if self.catalog:
+            self.catalog.save_data(self, data_json, page_ranges=page_ranges)
 
-        # Read the index data
-        with open(self.index_path, 'rb') as fobj:
-            try:
-                chapter_data = json.loads(fobj.read())
-            except Exception as e:
-                raise OSError('{} is invalid ({}). Please edit file and try again'.format(self.index_path, str(e)))
+        return self.pdf_data_path
 
-        # Get flat list of page numbers
-        next_pages = iter(sorted(self.flatten_dict(chapter_data['chapters']))[1:])
+    def is_data_file_outdated(self):
+        """
+            Checks if the pdf or -index.json file have changed since the -data.json file was written
+            Args: None
+            Returns boolean indicating if -data.json file needs to be regenerated
+        """
+        if not os.path.exists(self.pdf_data_path):
+            return False
+        data_mtime = os.path.getmtime(self.pdf_data_path)
+        return any(os.path.getmtime(p) > data_mtime for p in [self.download_url, self.index_path] if os.path.exists(p))
+
+    def backup_file(self, path):
+        """
+            Moves a file to <path>.<time>.bak, never replacing an earlier backup
+            Args: path (str) path to file to back up
+            Returns str path to backup
+        """
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        backup_path = '{}.{}.bak'.format(path, stamp)
+        count = 1
+        while os.path.exists(backup_path):
+            backup_path = '{}.{}-{}.bak'.format(path, stamp, count)
+            count += 1
+        print('-- Moved {} to {}'.format(path, backup_path))
+        os.rename(path, backup_path)
+        return backup_path
+
+    def clear_data_file(self):
+        """
+            Backs up the -data.json file and removes the split pdfs so they can be regenerated
+            Args: None
+            Returns None
+        """
+        # Keep the old -data.json file so any edited exercise data can be copied over
+        if os.path.exists(self.pdf_data_path):
+            self.backup_file(self.pdf_data_path)
 
-        # Write pdf data to -data.json path
-        pdf_data = self.write_pdf(chapter_data['chapters'], chapter_data['offset'], next_pages)
-        with open(self.pdf_data_path, 'wb') as fobj:
-            fobj.write(json.dumps(pdf_data, indent=2, ensure_ascii=False).encode('utf-8'))
+        # Finished chapters are based on the old page ranges
+        ChapterJournal(self.journal_path).remove()
 
-        return self.pdf_data_path
+        # Split pdfs are reused if they exist, so remove them to pick up the new page ranges
+        shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+        os.makedirs(os.path.dirname(self.path))
 
-    def write_pdf(self, chapter_data, offset, pages, folder=''):
+    def write_pdf(self, page_ranges, journal=None):
         """
             Writes split pdfs
             Args:
-                - chapter_data (dict) index data for chapters
-                - offset (int) difference between first page number and where first page actually starts
-                - pages (list) list of page numbers (used to get where chapter ends)
-                - folder (str) name of folder to save pdfs under (important if chapters have the same name)
+                - page_ranges (list) page range data (see get_page_ranges docstring for sample)
+                - journal (ChapterJournal) journal to skip and record finished chapters with (optional)
+            Returns list of pdf data (see get_data_file docstring for sample)
         """
         book_data = []
 
-        # Iterate through chapter_data
-        for title, data in chapter_data.items():
+        # Iterate through page_ranges
+        for item in page_ranges:
             # Create topics for sections
-            if isinstance(data, dict):
-                print(title)
+            if 'header' in item:
+                print(item['header'])
                 book_data.append({
-                    "header": title,
-                    "chapters": self.write_pdf(data, offset, pages, folder=title)
+                    "header": item['header'],
+                    "chapters": self.write_pdf(item['chapters'], journal=journal)
                 })
 
+            # Use chapters that were finished by a previous run
+            elif journal and journal.get(item['folder'], item['chapter']):
+                print('---- {} (finished)'.format(item['chapter']))
+                book_data.append(journal.get(item['folder'], item['chapter']))
+
             # Create document nodes
             else:
-                print('---- {}'.format(title))
-
-                # Get where the page should end
-                try:
-                    end = next(pages) - 1 + offset
-                except StopIteration:
-                    end = self.pdf.numPages
+                print('---- {}'.format(item['chapter']))
 
                 # Split pdf, extract exercises, and add to book_data
-                pdf_path = self.write_pages(title, data - 1 + offset, end, folder=self.get_filename(folder))
-                exercise_data = self.extract_exercises(pdf_path)
+                pdf_path = self.write_pages(item['chapter'], item['start'], item['end'], folder=item['folder'])
+                if self.optimize:
+                    self.optimize_pdf(pdf_path)
+                if self.profiler:
+                    self.profiler.stage('split: {}'.format(item['chapter']))
+                exercise_data = self.extract_exercises(pdf_path, pages=range(item['start'], item['end']))
+                if self.profiler:
+                    self.profiler.stage('extract: {}'.format(item['chapter']))
                 book_data.append({
-                    "chapter": title,
+                    "chapter": item['chapter'],
                     "path": pdf_path,
                     "exercises": exercise_data
                 })
+                if self.stage:
+                    # The chef checks the size and modified time before trusting the md5
+                    stat = os.stat(pdf_path)
+                    book_data[-1].update(md5=self.stage_file(pdf_path), size=stat.st_size, mtime=stat.st_mtime)
+                if journal:
+                    journal.add(item['folder'], book_data[-1])
         return book_data
 
     def write_pages(self, title, start, end, folder='pdfs'):
@@ -440,7 +1085,7 @@ class PDFParser(object):
         """
 
         # Create a writer and set where to write path to
-        writer = PdfFileWriter()
+        writer = PooledPdfFileWriter(self.object_pool)
         directory = os.path.sep.join([os.path.dirname(self.path), folder])
         write_to_path = os.path.sep.join([directory, "{}.pdf".format(self.get_filename(title))])
 
@@ -465,16 +1110,110 @@ class PDFParser(object):
                         path=self.download_url, num=end, index=self.index_path, data=self.pdf_data_path
                     ))
 
-        # Write the finished file to the write_to_path
-        with open(write_to_path, 'wb') as outfile:
-            writer.write(outfile)
+        # Write the finished file to the write_to_path (through a temporary file so
+        # an interrupted run doesn't leave a partial pdf that would be reused)
+        tmp_path = '{}.tmp'.format(write_to_path)
+        with open(tmp_path, 'wb') as outfile:
+            hashed_outfile = HashingWriter(outfile)
+            writer.write(hashed_outfile)
+            print('-------- Wrote {} bytes ({} reused)'.format(outfile.tell(), writer.reused_bytes))
+        os.replace(tmp_path, write_to_path)
+        self.file_digests[write_to_path] = hashed_outfile.hexdigest()
 
         return write_to_path
 
-    def extract_exercises(self, filepath):
+    def stage_file(self, filepath):
+        """
+            Adds a split pdf to ricecooker's storage so the chef doesn't need to copy it
+            Args: filepath (str) path to split pdf
+            Returns str md5 of file
+
+            ---
+
+            Note: ricecooker stores files as <md5>.<ext>, and DocumentFile normally
+            reads, hashes and copies every file into storage when the chef runs.
+            The md5 is computed while the pdf is written (see write_pages), and the
+            file is hardlinked into storage, so the chef can use the stored file
+            directly. If the storage is on another filesystem, the file is copied.
+        """
+        from ricecooker.config import get_storage_path  # Imported here since ricecooker is slow to import
+
+        digest = self.file_digests.get(filepath)
+        if not digest:     # The file was written by a previous run or changed since it was written
+            md5 = hashlib.md5()
+            with open(filepath, 'rb') as fobj:
+                for chunk in iter(lambda: fobj.read(2**20), b''):
+                    md5.update(chunk)
+            digest = md5.hexdigest()
+
+        storage_path = get_storage_path('{}.pdf'.format(digest))
+        if not os.path.exists(storage_path):
+            if not os.path.exists(os.path.dirname(storage_path)):
+                os.makedirs(os.path.dirname(storage_path))
+            try:
+                os.link(filepath, storage_path)
+            except OSError:
+                tmp_path = '{}.tmp'.format(storage_path)
+                shutil.copyfile(filepath, tmp_path)
+                os.replace(tmp_path, storage_path)
+        return digest
+
+    def optimize_pdf(self, filepath):
+        """
+            Compresses content streams, removes duplicate objects, and linearizes a split pdf
+            Args: filepath (str) path to pdf to optimize in place
+            Returns tuple of (original size, optimized size) in bytes
+
+            ---
+
+            Note: PyPDF2 can't linearize pdfs (i.e. order the file so the first
+            page can be displayed before the rest of the file has downloaded),
+            so this step is skipped if qpdf isn't installed
+        """
+        original_size = os.path.getsize(filepath)
+        directory = os.path.dirname(filepath)
+
+        # Rewrite the pdf with compressed content streams and without duplicate objects
+        with open(filepath, 'rb') as fobj:
+            reader = PdfFileReader(fobj, strict=False)
+            writer = PooledPdfFileWriter(SharedObjectPool(), deduplicate=True)
+            for page in reader.pages:
+                page.compressContentStreams()
+                writer.addPage(page)
+            with tempfile.NamedTemporaryFile(dir=directory, suffix='.pdf', delete=False) as tmpfile:
+                writer.write(tmpfile)
+        optimized_path = tmpfile.name
+
+        # Linearize the pdf for faster first page display
+        linearized = False
+        qpdf = shutil.which('qpdf')
+        if qpdf:
+            linearized_path = '{}.linearized.pdf'.format(optimized_path)
+            # qpdf returns 3 if the pdf was written with warnings
+            linearized = subprocess.call([qpdf, '--linearize', '--object-streams=generate', optimized_path, linearized_path]) in (0, 3)
+            if linearized:
+                os.replace(linearized_path, optimized_path)
+            elif os.path.exists(linearized_path):
+                os.remove(linearized_path)
+
+        # Keep the optimized pdf if it is smaller or can be displayed sooner
+        optimized_size = os.path.getsize(optimized_path)
+        if optimized_size < original_size or linearized:
+            os.replace(optimized_path, filepath)
+            self.file_digests.pop(filepath, None)
+        else:
+            os.remove(optimized_path)
+            optimized_size = original_size
+
+        print('-------- Optimized {} ({} bytes -> {} bytes)'.format(os.path.basename(filepath), original_size, optimized_size))
+        return original_size, optimized_size
+
+    def extract_exercises(self, filepath, pages=None):
         """
             Reads the file and extracts potential exercise questions
-            Args: filepath (str) path to file to read
+            Args:
+                - filepath (str) path to file to read
+                - pages (iterable) page numbers the file was split from, to skip tika if none have text (optional)
             Returns list of exercise data
 
             ---
@@ -508,8 +1247,14 @@ class PDFParser(object):
         """
         exercises = []
 
+        # Skip files without any text (e.g. scanned chapters)
+        if pages is not None and not any(self.has_text(index) for index in pages):
+            self.skipped_pages.update(pages)
+            return
+
         # Read file and get text
-        page = parser.from_file(filepath)['content']
+        with open(filepath, 'rb') as fobj:
+            page = read_with_tika(fobj)
         if not page:
             return
 
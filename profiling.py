@@ -0,0 +1,143 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from config import DOWNLOAD_DIRECTORY
+
+# Ways to profile a book
+PROFILE_MODES = ('cprofile', 'sample', 'memory')
+
+
+def profile_book(profiler, name):
+    """
+        Profiles a book if profiling is turned on
+        Args:
+            - profiler (Profiler) profiler to use (or None if profiling is off)
+            - name (str) name of book to write reports for
+        Returns context to run the book's work in
+    """
+    return profiler.profile(name) if profiler else nullcontext()
+
+
+class Profiler(object):
+    """
+        The Profiler object profiles the work done for each book and
+        writes the results to a separate set of files per book:
+            - cprofile: <book>.prof (for pstats, snakeviz, etc.) and <book>.txt
+            - sample: <book>.folded (wall-clock stacks for flamegraph.pl, speedscope, etc.)
+            - memory: <book>-memory.txt (top allocations at each stage)
+        Every mode also writes <book>-stages.txt with the time each stage finished
+    """
+    def __init__(self, mode, directory=None, interval=0.005, top=20):
+        if mode not in PROFILE_MODES:
+            raise ValueError('Unknown profile mode {} (expected one of {})'.format(mode, ', '.join(PROFILE_MODES)))
+        self.mode = mode
+        self.directory = directory or os.path.sep.join([DOWNLOAD_DIRECTORY, 'profiles'])
+        self.interval = interval    # Seconds between samples in sample mode
+        self.top = top              # Number of functions or allocations to list in reports
+        self.current = None         # Name of book being profiled
+        self.stages = []            # List of (stage, seconds since start) for current book
+        self.snapshots = []         # List of (stage, tracemalloc snapshot) for current book
+
+    def get_path(self, name, suffix):
+        """ Returns path to write a report for a book to """
+        return os.path.sep.join([self.directory, '{}{}'.format(re.sub(r"[^\w\-.]+", "_", name), suffix)])
+
+    @contextmanager
+    def profile(self, name):
+        """
+            Profiles everything run inside the context (e.g. with profiler.profile('book.pdf'): )
+            Args: name (str) name of book to write reports for
+            Returns None
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.current = name
+        self.stages = []
+        self.snapshots = []
+        self.start = time.perf_counter()
+
+        if self.mode == 'cprofile':
+            profile = cProfile.Profile()
+            profile.enable()
+        elif self.mode == 'sample':
+            stacks = Counter()
+            stop = threading.Event()
+            sampler = threading.Thread(target=self.sample, args=(threading.get_ident(), stacks, stop), daemon=True)
+            sampler.start()
+        elif self.mode == 'memory':
+            tracemalloc.start()
+
+        try:
+            yield
+        finally:
+            self.stage('end')
+            if self.mode == 'cprofile':
+                profile.disable()
+                self.write_cprofile(name, profile)
+            elif self.mode == 'sample':
+                stop.set()
+                sampler.join()
+                self.write_samples(name, stacks)
+            elif self.mode == 'memory':
+                tracemalloc.stop()
+                self.write_snapshots(name)
+            self.write_stages(name)
+            self.current = None
+
+    def stage(self, label):
+        """
+            Marks the end of a stage (e.g. index, split, extract, node build) for the current book
+            Args: label (str) name of stage
+            Returns None
+        """
+        if self.current is None:
+            return
+        self.stages.append((label, time.perf_counter() - self.start))
+        if self.mode == 'memory' and tracemalloc.is_tracing():
+            self.snapshots.append((label, tracemalloc.take_snapshot()))
+
+    def sample(self, thread_id, stacks, stop):
+        """ Records the stack of a thread every interval until stop is set """
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame:
+                stack.append('{} ({}:{})'.format(frame.f_code.co_name, os.path.basename(frame.f_code.co_filename), frame.f_code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stacks[';'.join(reversed(stack))] += 1
+
+    def write_cprofile(self, name, profile):
+        profile.dump_stats(self.get_path(name, '.prof'))
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(self.top)
+        with open(self.get_path(name, '.txt'), 'wb') as fobj:
+            fobj.write(report.getvalue().encode('utf-8'))
+
+    def write_samples(self, name, stacks):
+        with open(self.get_path(name, '.folded'), 'wb') as fobj:
+            for stack, count in stacks.most_common():
+                fobj.write('{} {}\n'.format(stack, count).encode('utf-8'))
+
+    def write_snapshots(self, name):
+        lines = []
+        for label, snapshot in self.snapshots:
+            stats = snapshot.statistics('lineno')
+            lines.append('{} ({:.1f} MB traced)'.format(label, sum(stat.size for stat in stats) / 1e6))
+            lines.extend('    {}'.format(stat) for stat in stats[:self.top])
+        with open(self.get_path(name, '-memory.txt'), 'wb') as fobj:
+            fobj.write('\n'.join(lines).encode('utf-8'))
+
+    def write_stages(self, name):
+        with open(self.get_path(name, '-stages.txt'), 'wb') as fobj:
+            for label, elapsed in self.stages:
+                fobj.write('{:>10.3f}s {}\n'.format(elapsed, label).encode('utf-8'))
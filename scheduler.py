@@ -0,0 +1,218 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import heapq
+import json
+import os
+import time
+import traceback
+
+from config import DOWNLOAD_DIRECTORY
+from profiling import Profiler, profile_book
+
+
+def run_task(path, task, directory=DOWNLOAD_DIRECTORY, optimize=False, catalog_path=None, stage=False, profile=None, profile_directory=None):
+    """
+        Generates the -index.json or -data.json file for a pdf
+        Args:
+            - path (str) path to pdf
+            - task (str) 'index' or 'data'
+            - directory (str) directory to write split pdfs to (optional)
+            - optimize (bool) compress and linearize split pdfs (optional)
+            - catalog_path (str) path to catalog to record files in (optional)
+            - stage (bool) link split pdfs into ricecooker's storage (optional)
+            - profile (str) profile the book with 'cprofile', 'sample' or 'memory' (optional)
+            - profile_directory (str) directory to write profiles to (optional)
+        Returns str path to generated file
+    """
+    from catalog import Catalog
+    from pdf_splitter import PDFParser
+
+    catalog = catalog_path and Catalog(catalog_path)
+    profiler = profile and Profiler(profile, directory=profile_directory)
+    with profile_book(profiler, '{}-{}'.format(os.path.basename(path), task)):
+        with PDFParser(path, directory=directory, optimize=optimize, catalog=catalog, stage=stage, profiler=profiler) as parser:
+            if task == 'index':
+                return parser.generate_index_file('.')
+            elif task == 'data':
+                return parser.generate_data_file()
+    raise ValueError('Unknown task {}'.format(task))
+
+def is_transient_error(error):
+    """
+        Checks if an error is likely to go away if the book is tried again (e.g. tika timeouts)
+        Args: error (Exception) error to check
+        Returns boolean indicating if error is transient
+    """
+    import requests  # Installed with tika
+    from pdf_splitter import TikaError
+
+    if isinstance(error, (requests.exceptions.RequestException, TikaError)):
+        return True
+    return isinstance(error, RuntimeError) and 'tika' in str(error).lower()
+
+def run_book(path, task, options):
+    """
+        Runs a task for a book in a worker process
+        Args:
+            - path (str) path to pdf
+            - task (str) 'index' or 'data'
+            - options (dict) keyword arguments for run_task
+        Returns dict of result or structured error
+    """
+    try:
+        return {'result': run_task(path, task, **options)}
+    except Exception as e:
+        return {
+            'error': {
+                'type': type(e).__name__,
+                'message': str(e),
+                'transient': is_transient_error(e),
+                'traceback': traceback.format_exc(),
+            }
+        }
+
+
+class BookScheduler(object):
+    """
+        The BookScheduler object runs a task for many books at once in
+        separate processes. A book that fails doesn't stop the others;
+        transient errors are retried with an increasing delay while the
+        other books keep the workers busy, and every failure is recorded
+        so it can be written to a report at the end. If a worker process
+        dies (e.g. it runs out of memory), the books it was running with
+        are retried in a new set of processes
+    """
+    def __init__(self, task, workers=None, retries=3, backoff=10, **options):
+        self.task = task                            # 'index' or 'data'
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)   # Number of books to process at once (tika needs cpus too)
+        self.retries = retries                      # Number of times to retry transient errors
+        self.backoff = backoff                      # Seconds to wait before the first retry (doubles after each retry)
+        self.options = options                      # Keyword arguments for run_task
+        self.succeeded = []                         # Paths to pdfs that finished
+        self.failures = []                          # Structured failure data
+
+    def run(self, pdf_paths):
+        """
+            Runs the task for every pdf
+            Args: pdf_paths (list) paths to pdfs
+            Returns list of failure data
+        """
+        waiting = [(0, path, 1) for path in pdf_paths]     # Heap of (time to start, path, attempt)
+        heapq.heapify(waiting)
+        running = {}                                        # Map of futures to (path, attempt)
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while waiting or running:
+                # Start any books that are ready to run (only as many as there are workers,
+                # so a worker that dies only takes the books that were running with it)
+                broken = False
+                while waiting and waiting[0][0] <= time.time() and len(running) < self.workers:
+                    _start, path, attempt = heapq.heappop(waiting)
+                    try:
+                        running[self.submit(executor, path)] = (path, attempt)
+                    except BrokenProcessPool:
+                        heapq.heappush(waiting, (0, path, attempt))
+                        broken = True
+                        break
+
+                # Wait for a book to finish or for the next retry to be ready
+                if running:
+                    timeout = max(waiting[0][0] - time.time(), 0) if waiting and len(running) < self.workers else None
+                    done, _pending = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                elif not broken:
+                    time.sleep(max(waiting[0][0] - time.time(), 0))
+                    continue
+                else:
+                    done = set()
+
+                for future in done:
+                    path, attempt = running.pop(future)
+                    outcome = self.get_outcome(future)
+                    broken = broken or outcome.get('error', {}).get('type') == BrokenProcessPool.__name__
+                    self.record(path, attempt, outcome, waiting)
+
+                if broken:
+                    # Every book still running in the broken processes has failed with them
+                    print('WARNING: A worker process stopped unexpectedly, starting new workers')
+                    for future, (path, attempt) in running.items():
+                        self.record(path, attempt, self.get_outcome(future), waiting)
+                    running = {}
+                    executor.shutdown(wait=True)
+                    executor = ProcessPoolExecutor(max_workers=self.workers)
+        finally:
+            executor.shutdown(wait=True)
+
+        return self.failures
+
+    def submit(self, executor, path):
+        """ Starts the task for a book in a worker process and returns its future """
+        return executor.submit(run_book, path, self.task, self.options)
+
+    def get_outcome(self, future):
+        """
+            Waits for a book to finish
+            Args: future (Future) future returned by submit
+            Returns dict of result or structured error (see run_book)
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            # The book may not be what stopped the worker, so it's worth trying again
+            return {
+                'error': {
+                    'type': type(e).__name__,
+                    'message': 'A worker process stopped while processing this book ({})'.format(e),
+                    'transient': True,
+                    'traceback': traceback.format_exc(),
+                }
+            }
+
+    def record(self, path, attempt, outcome, waiting):
+        """
+            Records the outcome of a book, scheduling a retry for transient errors
+            Args:
+                - path (str) path to pdf
+                - attempt (int) number of times the book has been tried
+                - outcome (dict) result or structured error (see run_book)
+                - waiting (list) heap of books waiting to start
+            Returns None
+        """
+        error = outcome.get('error')
+        if not error:
+            self.succeeded.append(path)
+        elif error['transient'] and attempt <= self.retries:
+            delay = self.backoff * 2 ** (attempt - 1)
+            print('WARNING: Retrying {} in {}s ({}: {})'.format(path, delay, error['type'], error['message']))
+            heapq.heappush(waiting, (time.time() + delay, path, attempt + 1))
+        else:
+            print('ERROR: Unable to process {} ({}: {})'.format(path, error['type'], error['message'].split('\n')[0]))
+            self.failures.append(dict(error, pdf=path, task=self.task, attempts=attempt))
+
+    def write_report(self, path):
+        """
+            Writes the results to a json file
+            Args: path (str) path to write report to
+            Returns None
+        """
+        with open(path, 'wb') as fobj:
+            fobj.write(json.dumps({
+                'task': self.task,
+                'succeeded': len(self.succeeded),
+                'failed': len(self.failures),
+                'failures': self.failures,
+            }, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+def find_pdfs(directory):
+    """
+        Lists the pdfs under a directory
+        Args: directory (str) directory to search
+        Returns list of str paths to pdfs
+    """
+    pdf_paths = []
+    for subdirectory, folders, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[-1] == '.pdf':
+                pdf_paths.append(os.path.sep.join([subdirectory, file]))
+    return pdf_paths
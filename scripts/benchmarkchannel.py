@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+
+class StubNode(object):
+    """ Stands in for ricecooker's node, file and question classes so the benchmark runs offline """
+    count = 0
+
+    def __init__(self, *args, **kwargs):
+        StubNode.count += 1
+        self.source_id = kwargs.get('source_id')
+        self.kwargs = kwargs
+        self.children = []
+
+    def add_child(self, node):
+        self.children.append(node)
+
+    def add_file(self, file):
+        self.children.append(file)
+
+    def add_question(self, question):
+        self.children.append(question)
+
+    def set_thumbnail(self, thumbnail):
+        self.thumbnail = thumbnail
+
+class StubThumbnails(object):
+    """ Stands in for ThumbnailGenerator, so the benchmark doesn't depend on pdftoppm (the pdfs are empty anyway) """
+    def __init__(self):
+        self.pending = []
+
+    def add_thumbnail(self, node, pdf_path):
+        self.pending.append((node, pdf_path))
+
+    def finish(self):
+        self.pending = []
+
+def stub_modules():
+    """ Installs stub ricecooker and le_utils modules (sushichef only needs a few names from them) """
+    stubs = {
+        'ricecooker': {},
+        'ricecooker.chefs': {'SushiChef': object},
+        'ricecooker.classes': {
+            'nodes': types.SimpleNamespace(TopicNode=StubNode, VideoNode=StubNode, DocumentNode=StubNode, ExerciseNode=StubNode),
+            'files': types.SimpleNamespace(VideoFile=StubNode, DocumentFile=StubNode, ThumbnailFile=StubNode),
+            'questions': types.SimpleNamespace(SingleSelectQuestion=StubNode, MultipleSelectQuestion=StubNode),
+        },
+        'ricecooker.config': {'LOGGER': None, 'get_storage_path': lambda filename: filename},
+        'ricecooker.exceptions': {'raise_for_invalid_channel': lambda channel: None},
+        'le_utils': {},
+        'le_utils.constants': {
+            'exercises': types.SimpleNamespace(SINGLE_SELECTION='single_selection', MULTIPLE_SELECTION='multiple_selection'),
+            'content_kinds': types.SimpleNamespace(VIDEO='video', DOCUMENT='document'),
+        },
+    }
+    for name, attributes in stubs.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+def generate_data(path, chapters, questions):
+    """ Generates -data.json data with the given number of chapters and questions per chapter """
+    return [{
+        "header": "Section",
+        "chapters": [{
+            "chapter": "Chapter {}".format(index),
+            "path": path,
+            "exercises": [{
+                "description": "Exercise",
+                "questions": [{
+                    "question": "Question {}".format(question_index),
+                    "type": "single_selection" if question_index % 2 else "multiple_selection",
+                    "answers": {"Answer {}".format(answer): answer == 0 for answer in range(4)},
+                } for question_index in range(questions)],
+            }],
+        } for index in range(chapters)],
+    }]
+
+def generate_tree(directory, depth, folders, videos, pdfs, chapters, questions):
+    """
+        Generates a FOLDER tree of empty videos and pdfs with -data.json files
+        Args:
+            - directory (str) directory to generate tree in
+            - depth (int) number of levels of folders
+            - folders (int) number of folders in each folder
+            - videos (int) number of videos in each folder
+            - pdfs (int) number of pdfs in each folder
+            - chapters (int) number of chapters in each pdf's -data.json file
+            - questions (int) number of questions in each chapter
+        Returns dict of counts of generated items
+    """
+    counts = {'folders': 0, 'videos': 0, 'books': 0, 'chapters': 0}
+    data_json = None
+    levels = [directory]
+    for level in range(depth + 1):
+        next_levels = []
+        for folder in levels:
+            for index in range(videos):
+                open(os.path.join(folder, 'v{}.mp4'.format(index)), 'wb').close()
+            for index in range(pdfs):
+                pdf_path = os.path.join(folder, 'b{}.pdf'.format(index))
+                open(pdf_path, 'wb').close()
+                # Every chapter points to the book itself, since the split pdfs are never opened
+                data_json = json.dumps(generate_data(pdf_path, chapters, questions))
+                with open(os.path.join(folder, 'b{}-data.json'.format(index)), 'wb') as fobj:
+                    fobj.write(data_json.encode('utf-8'))
+            counts['videos'] += videos
+            counts['books'] += pdfs
+            counts['chapters'] += pdfs * chapters
+            if level < depth:
+                for index in range(folders):
+                    subfolder = os.path.join(folder, 'f{}'.format(index))
+                    os.mkdir(subfolder)
+                    next_levels.append(subfolder)
+        counts['folders'] += len(next_levels)
+        levels = next_levels
+    return counts
+
+def remove_tree(directory):
+    """ Removes a generated tree (shutil.rmtree recurses once per folder, so it fails on deep trees) """
+    folders = [directory]
+    for folder in folders:
+        folders.extend(entry.path for entry in os.scandir(folder) if entry.is_dir(follow_symlinks=False))
+    for folder in reversed(folders):
+        for entry in os.scandir(folder):
+            os.remove(entry.path)
+        os.rmdir(folder)
+
+def scrape_channel(directory, catalog_path, snapshot_path):
+    """
+        Builds the channel tree the way construct_channel does: every -data.json file
+        is validated first, and the folders are read with the catalog and snapshot
+        (only thumbnails are stubbed out)
+        Args:
+            - directory (str) directory to build tree from
+            - catalog_path (str) path to catalog database
+            - snapshot_path (str) path to snapshot file
+        Returns None
+    """
+    import sushichef
+    from catalog import Catalog
+    from snapshot import ChannelSnapshot
+    from validation import validate_data_files
+
+    catalog = Catalog(catalog_path)
+    errors = validate_data_files(directory, catalog=catalog)
+    if errors:
+        raise OSError('Found {} problems in -data.json files:\n{}'.format(len(errors), '\n'.join(errors)))
+    thumbnails = StubThumbnails()
+    snapshot = ChannelSnapshot(snapshot_path)
+    sushichef.scrape_directory(StubNode(), directory, thumbnails=thumbnails, snapshot=snapshot, catalog=catalog)
+    thumbnails.finish()
+    snapshot.save()
+    catalog.connection.close()
+
+def remove_files(*paths):
+    """ Removes the catalog and snapshot files (including sqlite's -wal and -shm files) so the next run starts cold """
+    for path in paths:
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def measure(run, setup=None):
+    """
+        Runs a function twice (without its progress output): once to time it, and
+        once with tracemalloc to find its peak memory, since tracing slows it down
+        Args:
+            - run (function) function to measure
+            - setup (function) function to call before each run, outside of the measurement (optional)
+        Returns (seconds, peak MB, nodes created)
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        setup and setup()
+        StubNode.count = 0
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        node_count = StubNode.count
+
+        setup and setup()
+        tracemalloc.start()
+        try:
+            run()
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return elapsed, peak / 1e6, node_count
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Measure scrape_directory and generate_pdf_nodes on generated channel trees")
+    argparser.add_argument('--scales', default='1,2,4,8', help="Comma-separated multipliers for the number of videos and pdfs in each folder")
+    argparser.add_argument('--depth', type=int, default=3, help="Number of levels of folders (use --folders 1 to test deep nesting)")
+    argparser.add_argument('--folders', type=int, default=3, help="Number of folders in each folder")
+    argparser.add_argument('--videos', type=int, default=10, help="Number of videos in each folder (at scale 1)")
+    argparser.add_argument('--pdfs', type=int, default=2, help="Number of pdfs in each folder (at scale 1)")
+    argparser.add_argument('--chapters', type=int, default=100, help="Number of chapters in each pdf")
+    argparser.add_argument('--questions', type=int, default=5, help="Number of questions in each chapter")
+    args = argparser.parse_args()
+
+    stub_modules()
+    import sushichef
+    from pdf_splitter import PDFParser
+
+    print('{:>6} {:>8} {:>8} {:>6} {:>9} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>12} {:>10}'.format(
+        'scale', 'folders', 'videos', 'books', 'chapters', 'nodes', 'scrape', 'peak', 'chef cold', 'peak', 'chef warm', 'peak', 'nodes only', 'peak'))
+    for scale in [int(s) for s in args.scales.split(',')]:
+        directory = tempfile.mkdtemp()
+        state_directory = tempfile.mkdtemp()    # Outside of the tree, so the catalog and snapshot aren't read as content
+        catalog_path = os.path.join(state_directory, 'catalog.sqlite3')
+        snapshot_path = os.path.join(state_directory, 'channel-snapshot.pickle')
+        try:
+            counts = generate_tree(directory, args.depth, args.folders, args.videos * scale, args.pdfs * scale, args.chapters, args.questions)
+
+            # Read the whole tree and build its nodes, without any of the chef's checks or caches
+            try:
+                scrape_time, scrape_peak, node_count = measure(lambda: sushichef.scrape_directory(StubNode(), directory))
+            except RecursionError:
+                print('{:>6} {:>8} FAILED (RecursionError at depth {})'.format(scale, counts['folders'], args.depth))
+                continue
+
+            # Build the tree the way the chef does, on the first run (empty catalog and snapshot) and on a run
+            # after it (nothing changed, so the catalog and snapshot are used)
+            chef_run = lambda: scrape_channel(directory, catalog_path, snapshot_path)
+            cold_time, cold_peak, _count = measure(chef_run, setup=lambda: remove_files(catalog_path, snapshot_path))
+            warm_time, warm_peak, _count = measure(chef_run)
+
+            # Build the nodes for data that has already been read
+            books = []
+            for subdirectory, _folders, files in os.walk(directory):
+                books.extend(PDFParser(os.path.join(subdirectory, file)).get_data_file(compact=True) for file in files if file.endswith('.pdf'))
+            def generate_nodes():
+                topic = StubNode()
+                for book in books:
+                    sushichef.generate_pdf_nodes(book, topic, source='b')
+            nodes_time, nodes_peak, _count = measure(generate_nodes)
+
+            print('{:>6} {:>8} {:>8} {:>6} {:>9} {:>9} {:>9.3f}s {:>8.1f}MB {:>9.3f}s {:>8.1f}MB {:>9.3f}s {:>8.1f}MB {:>11.3f}s {:>8.1f}MB'.format(
+                scale, counts['folders'], counts['videos'], counts['books'], counts['chapters'], node_count,
+                scrape_time, scrape_peak, cold_time, cold_peak, warm_time, warm_peak, nodes_time, nodes_peak))
+        finally:
+            remove_tree(directory)
+            remove_tree(state_directory)
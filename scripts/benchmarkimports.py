@@ -0,0 +1,61 @@
+import argparse
+import os
+import subprocess
+import sys
+import os.path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+
+# Commands to measure (run with -X importtime from the repository root)
+ENTRY_POINTS = [
+    ['-c', 'import sushichef'],
+    ['scripts/generateindex.py', '--help'],
+    ['scripts/generatedata.py', '--help'],
+    ['scripts/plandata.py', '--help'],
+    ['scripts/managecatalog.py', '--help'],
+    ['scripts/distribute.py', '--help'],
+    ['-c', 'import validation'],
+]
+
+def measure_imports(command):
+    """
+        Runs a command with -X importtime
+        Args: command (list) arguments to pass to python
+        Returns tuple of (total import seconds, list of (seconds, module) for the slowest top-level imports)
+            (total is None if the command failed)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command, cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode:
+        return None, [(0, line) for line in result.stderr.splitlines()[-1:]]
+
+    # Lines look like "import time:   self [us] | cumulative | imported package",
+    # with nested imports indented under the module that imported them
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _self, cumulative, module = line[len('import time:'):].split('|')
+        if not module[1:].startswith(' '):
+            top_level.append((int(cumulative) / 1e6, module.strip()))
+    return sum(t for t, _ in top_level), sorted(top_level, reverse=True)[:5]
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Check how long the chef and scripts spend importing modules")
+    argparser.add_argument('--budget', type=float, default=0.5, help="Maximum seconds each entry point may spend on imports")
+    args = argparser.parse_args()
+
+    over_budget = False
+    for command in ENTRY_POINTS:
+        total, slowest = measure_imports(command)
+        if total is None:
+            over_budget = True
+            print('{:<40} FAILED'.format(' '.join(command)))
+        else:
+            over_budget = over_budget or total > args.budget
+            print('{:<40} {:>7.3f}s {}'.format(' '.join(command), total, 'OK' if total <= args.budget else 'OVER BUDGET'))
+        for seconds, module in slowest:
+            print('    {:>7.3f}s {}'.format(seconds, module))
+
+    sys.exit(1 if over_budget else 0)
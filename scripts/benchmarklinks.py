@@ -0,0 +1,64 @@
+import argparse
+import time
+import os
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, 'examples')))
+
+from bs4 import BeautifulSoup
+from wikipedia_sushichef import unwrap_links
+
+def generate_page(link_count, links_per_row=5):
+    """ Generates a wikipedia-style list page with the given number of links """
+    rows = []
+    for row_index in range(0, link_count, links_per_row):
+        cells = ''.join(
+            '<td><a href="/wiki/Item_{0}" title="Item {0}">Item <b>{0}</b></a></td>'.format(index)
+            for index in range(row_index, min(row_index + links_per_row, link_count))
+        )
+        rows.append('<tr>{}<td><a href="#cite_note-{}">[1]</a></td></tr>'.format(cells, row_index))
+    return '<html><body><h1>List</h1><table>{}</table></body></html>'.format(''.join(rows))
+
+def replace_links(page):
+    """ Replaces links the way process_wikipedia_page used to (str.replace over the whole document for every link) """
+    content = str(page)
+    for link in page.find_all("a"):
+        if link.get('href') and not link['href'].startswith("#"):
+            content = content.replace(str(link), link.text)
+    return content
+
+def single_pass(page):
+    """ Replaces links in the tree and serializes the page once """
+    unwrap_links(page)
+    return str(page)
+
+def measure(name, process, html):
+    page = BeautifulSoup(html, "html.parser")
+    start = time.perf_counter()
+    content = process(page)
+    elapsed = time.perf_counter() - start
+    print('{:<12} {:>8.3f}s'.format(name, elapsed))
+    return content, elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Compare replacing links with str.replace and in a single pass over the page")
+    argparser.add_argument('--html', help="Path to a saved html page (defaults to a generated list page)")
+    argparser.add_argument('--links', type=int, default=5000, help="Number of links to generate if --html isn't given")
+    args = argparser.parse_args()
+
+    if args.html:
+        with open(args.html, 'rb') as fobj:
+            html = fobj.read().decode('utf-8')
+    else:
+        html = generate_page(args.links)
+
+    print('{} links ({} bytes)'.format(len(BeautifulSoup(html, "html.parser").find_all("a")), len(html)))
+    replaced, replace_time = measure('str.replace', replace_links, html)
+    unwrapped, single_pass_time = measure('single pass', single_pass, html)
+    print('{:.1f}x faster'.format(replace_time / single_pass_time))
+
+    # Both approaches should leave the same text on the page
+    if BeautifulSoup(replaced, "html.parser").get_text() != BeautifulSoup(unwrapped, "html.parser").get_text():
+        print('WARNING: Page text differs between the two approaches')
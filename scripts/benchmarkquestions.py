@@ -0,0 +1,104 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from benchmarkchannel import StubNode, stub_modules
+from pdf_splitter import PDFParser
+
+def generate_data(question_count, questions_per_exercise=10, exercises_per_chapter=5):
+    """ Generates -data.json data with the given number of questions """
+    data = []
+    for chapter_index in range(0, question_count, questions_per_exercise * exercises_per_chapter):
+        chapter = {"chapter": "Chapter {}".format(chapter_index), "path": "chapter.pdf", "exercises": []}
+        for exercise_index in range(exercises_per_chapter):
+            chapter['exercises'].append({
+                "description": "Exercise {}".format(exercise_index),
+                "questions": [{
+                    "question": "Question {} {}".format(exercise_index, i),
+                    "type": "single_selection",
+                    "answers": {"Answer {}".format(a): a == 0 for a in range(4)},
+                } for i in range(questions_per_exercise)],
+            })
+        data.append(chapter)
+    return data
+
+def create_dict_questions(exercise_node, exercise_data):
+    """ The chef's create_exercise_questions from before questions were loaded as ExerciseQuestion objects """
+    from le_utils.constants import exercises
+    from ricecooker.classes import questions
+
+    for question_index, question in enumerate(exercise_data):
+        assessment_id = "{}- {}".format(exercise_node.source_id, question_index)
+        correct_answers = [answer for answer, correct in question['answers'].items() if correct]
+        all_answers = [answer for answer, _ in question['answers'].items()]
+        if question["type"] == exercises.MULTIPLE_SELECTION:
+            exercise_node.add_question(questions.MultipleSelectQuestion(
+                id=assessment_id, question=question['question'], correct_answers=correct_answers, all_answers=all_answers))
+        elif question["type"] == exercises.SINGLE_SELECTION:
+            exercise_node.add_question(questions.SingleSelectQuestion(
+                id=assessment_id, question=question['question'], correct_answer=correct_answers[0], all_answers=all_answers))
+
+def create_nodes(data, create_questions):
+    """ Adds every exercise's questions to a node, the way generate_pdf_nodes does, and returns the nodes """
+    exercise_nodes = []
+    for chapter in data:
+        for exercise in chapter['exercises']:
+            exercise_nodes.append(StubNode(source_id=exercise['description']))
+            create_questions(exercise_nodes[-1], exercise['questions'])
+    return exercise_nodes
+
+def measure(run):
+    """
+        Runs a function twice (without its progress output): once to time it, and
+        once with tracemalloc to find its memory, since tracing slows it down
+        Returns (seconds, MB retained by the result, peak MB)
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        try:
+            result = run()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+    return elapsed, current / 1e6, peak / 1e6
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Compare loading -data.json questions and building their nodes as dicts and as ExerciseQuestion objects")
+    argparser.add_argument('--questions', type=int, default=50000, help="Number of questions to generate")
+    args = argparser.parse_args()
+
+    stub_modules()
+    import sushichef
+
+    directory = tempfile.mkdtemp()
+    parser = PDFParser(os.path.sep.join([directory, 'benchmark.pdf']), directory=directory)
+    with open(parser.pdf_data_path, 'wb') as fobj:
+        fobj.write(json.dumps(generate_data(args.questions)).encode('utf-8'))
+
+    print('{} questions ({} bytes)'.format(args.questions, os.path.getsize(parser.pdf_data_path)))
+    print('{:<8} {:>9} {:>10} {:>10} {:>12} {:>10} {:>9} {:>10}'.format('', 'load', 'retained', 'peak', 'node build', 'retained', 'total', 'retained'))
+    try:
+        # dicts is how the chef read questions before (get_data_file() and create_dict_questions)
+        for name, compact, create_questions in [('dicts', False, create_dict_questions), ('compact', True, sushichef.create_exercise_questions)]:
+            load_time, retained, load_peak = measure(lambda: parser.get_data_file(compact=compact))
+            data = parser.get_data_file(compact=compact)
+            nodes_time, nodes_retained, _peak = measure(lambda: create_nodes(data, create_questions))
+            print('{:<8} {:>8.3f}s {:>8.1f}MB {:>8.1f}MB {:>11.3f}s {:>8.1f}MB {:>8.3f}s {:>8.1f}MB'.format(
+                name, load_time, retained, load_peak, nodes_time, nodes_retained, load_time + nodes_time, retained + nodes_retained))
+    finally:
+        os.remove(parser.pdf_data_path)
+        os.rmdir(directory)
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import threading
+import time
+import traceback
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from config import DOWNLOAD_DIRECTORY, FOLDER
+from jobqueue import SQLiteJobQueue, get_worker_name
+from profiling import PROFILE_MODES
+from scheduler import find_pdfs, run_task
+
+HEARTBEAT_INTERVAL = 10     # Seconds between worker heartbeats
+HEARTBEAT_TIMEOUT = 120     # Seconds without a heartbeat before a job is handed out again
+IDLE_TIMEOUT = 600          # Seconds a worker waits without any jobs before stopping (in case the coordinator never starts or closes the queue)
+
+def coordinate(queue, directory, task):
+    """ Adds a job for every pdf under directory and waits for them to finish """
+    # Start over so pdfs that were done or failed in an earlier run are run again
+    queue.reset_jobs()
+    queue.set_open(True)
+    try:
+        for path in find_pdfs(directory):
+            queue.add_job(path, task)
+
+        while True:
+            requeued = queue.requeue_stale_jobs(HEARTBEAT_TIMEOUT)
+            if requeued:
+                print('Requeued {} jobs from unresponsive workers'.format(requeued))
+
+            counts = queue.get_counts()
+            print('Jobs: {}'.format(', '.join('{} {}'.format(v, k) for k, v in sorted(counts.items()))))
+            if not counts.get('pending') and not counts.get('running'):
+                break
+            time.sleep(HEARTBEAT_INTERVAL)
+    finally:
+        # Let the workers know there won't be any more jobs
+        queue.set_open(False)
+
+    failures = queue.get_failures()
+    for job in failures:
+        print('FAILED: {} ({})'.format(job['path'], job['error'].strip().splitlines()[-1]))
+    return failures
+
+def work(queue, directory, profile=None, profile_directory=None, idle_timeout=IDLE_TIMEOUT, poll_interval=HEARTBEAT_INTERVAL):
+    """
+        Runs jobs from the queue until the coordinator closes it (profiling each one if profile is set)
+        Args:
+            - queue (JobQueue) queue to claim jobs from
+            - directory (str) directory to write split pdfs to
+            - profile (str) profile each job with 'cprofile', 'sample' or 'memory' (optional)
+            - profile_directory (str) directory to write profiles to (optional)
+            - idle_timeout (float) seconds to wait without any pending or running jobs before stopping anyway (optional, None waits forever)
+            - poll_interval (float) seconds between checks for new jobs (optional)
+        Returns None
+    """
+    worker = get_worker_name()
+
+    # A queue that is already closed is left over from an earlier run, so wait for the coordinator to open it again
+    waiting_for_coordinator = queue.is_open() is False
+    idle_since = time.time()
+    while True:
+        job = queue.claim_job(worker)
+        if not job:
+            is_open = queue.is_open()
+            if is_open:
+                waiting_for_coordinator = False
+            elif is_open is False and not waiting_for_coordinator:
+                break
+
+            # Keep waiting while other workers have jobs that could be handed out again
+            counts = queue.get_counts()
+            if counts.get('pending') or counts.get('running'):
+                idle_since = time.time()
+            elif idle_timeout is not None and time.time() - idle_since >= idle_timeout:
+                print('{} stopped after {}s without any jobs'.format(worker, idle_timeout))
+                break
+            time.sleep(poll_interval)
+            continue
+        idle_since = time.time()
+
+        print('{} {} ({})'.format(worker, job['path'], job['task']))
+
+        # Send heartbeats from a separate connection while the job runs
+        finished = threading.Event()
+        def send_heartbeats():
+            heartbeat_queue = SQLiteJobQueue(queue.path)
+            while not finished.wait(HEARTBEAT_INTERVAL):
+                heartbeat_queue.heartbeat(job['id'], worker)
+        heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            queue.finish_job(job['id'], worker, result=run_task(job['path'], job['task'], directory=directory,
+                                                                 profile=profile, profile_directory=profile_directory))
+        except Exception:
+            queue.finish_job(job['id'], worker, error=traceback.format_exc())
+        finally:
+            finished.set()
+            heartbeat_thread.join()
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Process pdfs across multiple workers through a shared job queue")
+    argparser.add_argument('role', choices=['coordinator', 'worker'], help="Add jobs and wait for them to finish, or run jobs")
+    argparser.add_argument('--queue', default=os.path.sep.join([DOWNLOAD_DIRECTORY, 'jobs.sqlite3']), help="Path to job queue database (must be on a shared filesystem)")
+    argparser.add_argument('--task', choices=['index', 'data'], default='data', help="Generate -index.json or -data.json files")
+    argparser.add_argument('--downloads', default=DOWNLOAD_DIRECTORY, help="Directory to write split pdfs to (must be on a shared filesystem)")
+    argparser.add_argument('--profile', choices=PROFILE_MODES, help="Profile each job on this worker and write the results to --profile-dir")
+    argparser.add_argument('--profile-dir', help="Directory to write profiles to (defaults to downloads/profiles)")
+    argparser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help="Seconds a worker waits without any jobs before stopping (defaults to {})".format(IDLE_TIMEOUT))
+    args = argparser.parse_args()
+
+    queue = SQLiteJobQueue(args.queue)
+    if args.role == 'coordinator':
+        failures = coordinate(queue, FOLDER, args.task)
+        sys.exit(1 if failures else 0)
+    else:
+        work(queue, args.downloads, profile=args.profile, profile_directory=args.profile_dir, idle_timeout=args.idle_timeout)
@@ -1,17 +1,51 @@
+import argparse
 import os
 import sys
 import os.path
 sys.path.append(
     os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 
+from catalog import Catalog
 from config import FOLDER
 from pdf_splitter import PDFParser
+from profiling import PROFILE_MODES, Profiler, profile_book
+from scheduler import BookScheduler, find_pdfs
+from watcher import DirectoryWatcher
 
-def generate_data_files(directory):
-    for subdirectory, folders, files in os.walk(directory):
-        for file in files:
-            if os.path.splitext(file)[-1] == '.pdf':
-                with PDFParser(os.path.sep.join([subdirectory, file])) as parser:
-                    parser.generate_data_file()
+def generate_data_files(directory, optimize=False, catalog=None, workers=None, report=None, stage=False, profile=None, profile_directory=None):
+    scheduler = BookScheduler('data', workers=workers, optimize=optimize, catalog_path=catalog and catalog.path, stage=stage,
+                              profile=profile, profile_directory=profile_directory)
+    failures = scheduler.run(find_pdfs(directory))
+    if report:
+        scheduler.write_report(report)
+    return failures
 
-generate_data_files(FOLDER)
+def regenerate_data_file(filepath, optimize=False, catalog=None, stage=False, profiler=None):
+    with profile_book(profiler, '{}-data'.format(os.path.basename(filepath))):
+        with PDFParser(filepath, optimize=optimize, catalog=catalog, stage=stage, profiler=profiler) as parser:
+            # Only rebuild books whose pdf or -index.json file changed since the -data.json file was written
+            if parser.is_data_file_outdated():
+                parser.clear_data_file()
+            parser.generate_data_file()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Split pdfs and extract exercises into -data.json files")
+    argparser.add_argument('--watch', action='store_true', help="Keep running and rebuild books when their pdf or -index.json file changes")
+    argparser.add_argument('--optimize', action='store_true', help="Compress and linearize split pdfs")
+    argparser.add_argument('--workers', type=int, help="Number of pdfs to process at once (defaults to half the number of cpus)")
+    argparser.add_argument('--report', help="Path to write a json report of any pdfs that failed")
+    argparser.add_argument('--stage', action='store_true', help="Link split pdfs into ricecooker's storage so the chef doesn't copy them again")
+    argparser.add_argument('--profile', choices=PROFILE_MODES, help="Profile each pdf and write the results to --profile-dir")
+    argparser.add_argument('--profile-dir', help="Directory to write profiles to (defaults to downloads/profiles)")
+    args = argparser.parse_args()
+
+    catalog = Catalog()
+    if args.watch:
+        profiler = args.profile and Profiler(args.profile, directory=args.profile_dir)
+        DirectoryWatcher(FOLDER, suffixes=('.pdf', '-index.json')).watch(
+            lambda path: regenerate_data_file(path, optimize=args.optimize, catalog=catalog, stage=args.stage, profiler=profiler))
+    else:
+        failures = generate_data_files(FOLDER, optimize=args.optimize, catalog=catalog, workers=args.workers, report=args.report,
+                                       stage=args.stage, profile=args.profile, profile_directory=args.profile_dir)
+        sys.exit(1 if failures else 0)
@@ -1,19 +1,44 @@
+import argparse
 import os
 import sys
 import os.path
 sys.path.append(
     os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 
+from catalog import Catalog
 from config import FOLDER
 from pdf_splitter import PDFParser
+from profiling import PROFILE_MODES, Profiler, profile_book
+from scheduler import BookScheduler, find_pdfs
+from watcher import DirectoryWatcher
 
-def generate_indices(directory):
-    for subdirectory, folders, files in os.walk(directory):
-        for file in files:
-            if os.path.splitext(file)[-1] == '.pdf':
-                filepath = os.path.sep.join([subdirectory, file])
-                with PDFParser(filepath) as parser:
-                    parser.generate_index_file('.')
+def generate_indices(directory, catalog=None, workers=None, report=None, profile=None, profile_directory=None):
+    scheduler = BookScheduler('index', workers=workers, catalog_path=catalog and catalog.path, profile=profile, profile_directory=profile_directory)
+    failures = scheduler.run(find_pdfs(directory))
+    if report:
+        scheduler.write_report(report)
+    return failures
 
+def generate_index(filepath, catalog=None, profiler=None):
+    with profile_book(profiler, '{}-index'.format(os.path.basename(filepath))):
+        with PDFParser(filepath, catalog=catalog, profiler=profiler) as parser:
+            parser.generate_index_file('.')
 
-generate_indices(FOLDER)
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Generate -index.json files for pdfs")
+    argparser.add_argument('--watch', action='store_true', help="Keep running and generate indices for new or changed pdfs")
+    argparser.add_argument('--workers', type=int, help="Number of pdfs to process at once (defaults to half the number of cpus)")
+    argparser.add_argument('--report', help="Path to write a json report of any pdfs that failed")
+    argparser.add_argument('--profile', choices=PROFILE_MODES, help="Profile each pdf and write the results to --profile-dir")
+    argparser.add_argument('--profile-dir', help="Directory to write profiles to (defaults to downloads/profiles)")
+    args = argparser.parse_args()
+
+    catalog = Catalog()
+    if args.watch:
+        profiler = args.profile and Profiler(args.profile, directory=args.profile_dir)
+        DirectoryWatcher(FOLDER, suffixes=('.pdf',)).watch(lambda path: generate_index(path, catalog=catalog, profiler=profiler))
+    else:
+        failures = generate_indices(FOLDER, catalog=catalog, workers=args.workers, report=args.report,
+                                    profile=args.profile, profile_directory=args.profile_dir)
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from catalog import Catalog
+from config import FOLDER
+from pdf_splitter import PDFParser
+
+def get_parsers(directory):
+    for subdirectory, folders, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[-1] == '.pdf':
+                yield PDFParser(os.path.sep.join([subdirectory, file]))
+
+def import_files(catalog, directory):
+    for parser in get_parsers(directory):
+        for path in catalog.import_files(parser):
+            print('Imported {}'.format(path))
+
+def export_files(catalog, directory):
+    for parser in get_parsers(directory):
+        for path in catalog.export_files(parser):
+            print('Exported {}'.format(path))
+
+def list_changed(catalog):
+    for path in catalog.get_changed_books():
+        print(path)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Manage the catalog of books, chapters and exercises")
+    argparser.add_argument('command', choices=['import', 'export', 'changed'],
+        help="Import the -index.json and -data.json files into the catalog, export them from the catalog, or list books that changed since they were recorded")
+    argparser.add_argument('--catalog', help="Path to catalog database")
+    args = argparser.parse_args()
+
+    catalog = Catalog(args.catalog)
+    if args.command == 'import':
+        import_files(catalog, FOLDER)
+    elif args.command == 'export':
+        export_files(catalog, FOLDER)
+    else:
+        list_changed(catalog)
@@ -0,0 +1,45 @@
+import os
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from config import FOLDER
+from pdf_splitter import PDFParser
+
+def get_chapter_paths(data):
+    paths = []
+    for chapter in data:
+        if chapter.get('header'):
+            paths.extend(get_chapter_paths(chapter['chapters']))
+        elif chapter.get('path'):
+            paths.append(chapter['path'])
+    return paths
+
+def optimize_pdfs(directory):
+    total_original, total_optimized = 0, 0
+    for subdirectory, folders, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[-1] == '.pdf':
+                parser = PDFParser(os.path.sep.join([subdirectory, file]))
+                if not os.path.exists(parser.pdf_data_path):
+                    continue
+
+                print(file)
+                book_original, book_optimized = 0, 0
+                for path in get_chapter_paths(parser.get_data_file()):
+                    original_size, optimized_size = parser.optimize_pdf(path)
+                    book_original += original_size
+                    book_optimized += optimized_size
+                print('-- {} bytes -> {} bytes'.format(book_original, book_optimized))
+
+                total_original += book_original
+                total_optimized += book_optimized
+
+    if total_original:
+        print('Total: {} bytes -> {} bytes ({:.1f}% smaller)'.format(
+            total_original, total_optimized, 100.0 * (total_original - total_optimized) / total_original))
+
+
+if __name__ == '__main__':
+    optimize_pdfs(FOLDER)
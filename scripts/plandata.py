@@ -0,0 +1,50 @@
+import argparse
+import json
+import os
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from config import FOLDER
+from pdf_splitter import PDFParser
+
+def plan_data_files(directory, check_text=False):
+    plans = []
+    for subdirectory, folders, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[-1] == '.pdf':
+                with PDFParser(os.path.sep.join([subdirectory, file])) as parser:
+                    try:
+                        plans.append(parser.plan_data_file(check_text=check_text))
+                    except OSError as e:
+                        plans.append({"pdf": parser.download_url, "errors": [str(e)]})
+    return plans
+
+def print_plan(plan):
+    print(os.path.basename(plan['pdf']))
+    for chapter in plan.get('chapters') or []:
+        print('---- {} (pages {}-{})'.format(chapter['chapter'], chapter['start'] + 1, chapter['end']))
+    if 'pages' in plan and plan['text_free_pages'] is None:
+        print('-- {} of {} pages split, up to {} tika calls'.format(plan['split_pages'], plan['pages'], plan['tika_calls']))
+    elif 'pages' in plan:
+        print('-- {} of {} pages split, {} tika calls ({} pages without text)'.format(plan['split_pages'], plan['pages'], plan['tika_calls'], plan['text_free_pages']))
+    for error in plan['errors']:
+        print('-- ERROR: {}'.format(error))
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Report the page ranges scripts/generatedata.py would split")
+    argparser.add_argument('--json', action='store_true', help="Print the plan as json")
+    argparser.add_argument('--check-text', action='store_true', help="Check every page for text to count the pages that won't be sent to tika (slower)")
+    args = argparser.parse_args()
+
+    plans = plan_data_files(FOLDER, check_text=args.check_text)
+    if args.json:
+        print(json.dumps(plans, indent=2, ensure_ascii=False))
+    else:
+        for plan in plans:
+            print_plan(plan)
+
+    # Exit with an error code if any of the plans have issues
+    sys.exit(1 if any(plan['errors'] for plan in plans) else 0)
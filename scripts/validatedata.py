@@ -0,0 +1,16 @@
+import os
+import sys
+import os.path
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from config import FOLDER
+from validation import validate_data_files
+
+
+if __name__ == '__main__':
+    errors = validate_data_files(FOLDER)
+    for error in errors:
+        print('ERROR: {}'.format(error))
+    print('Found {} problems'.format(len(errors)))
+    sys.exit(1 if errors else 0)
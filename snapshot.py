@@ -0,0 +1,87 @@
+import os
+import pickle
+
+from config import DOWNLOAD_DIRECTORY
+
+# Increase when the format of the saved folder data changes
+SNAPSHOT_VERSION = 3
+
+
+class ChannelSnapshot(object):
+    """
+        The ChannelSnapshot object saves what was read from each folder
+        (videos and -data.json files) along with a fingerprint of the
+        folder's files, so folders that haven't changed don't need to be
+        read again on the next run
+    """
+    def __init__(self, path=None):
+        self.path = path or os.path.sep.join([DOWNLOAD_DIRECTORY, 'channel-snapshot.pickle'])
+        self.folders = {}       # Map of directory to saved fingerprint and items from the last run
+        self.current = {}       # Map of directory to fingerprint and items from this run
+        self.hits = 0           # Number of folders read from the snapshot
+
+        # Load the last run's snapshot, starting over if it can't be read
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as fobj:
+                    snapshot = pickle.load(fobj)
+                if snapshot.get('version') == SNAPSHOT_VERSION:
+                    self.folders = snapshot['folders']
+            except Exception as e:
+                print('WARNING: Unable to read snapshot {} ({})'.format(self.path, str(e)))
+
+    def get_fingerprint(self, directory, filenames):
+        """
+            Fingerprints the files in a folder
+            Args:
+                - directory (str) path to folder
+                - filenames (list) names of files in folder
+            Returns tuple of (filename, modified time, size) for each file (including -data.json files)
+        """
+        fingerprint = []
+        for filename in sorted(filenames):
+            try:
+                stat = os.stat(os.path.sep.join([directory, filename]))
+            except OSError:     # File was removed while reading the folder
+                continue
+            fingerprint.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def get(self, directory, fingerprint):
+        """
+            Returns the items saved for a folder if its files haven't changed
+            Args:
+                - directory (str) path to folder
+                - fingerprint (tuple) fingerprint of folder's files (see get_fingerprint)
+            Returns list of items (None if the folder needs to be read again)
+        """
+        folder = self.folders.get(directory)
+        if folder and folder['fingerprint'] == fingerprint:
+            self.hits += 1
+            self.current[directory] = folder
+            return folder['items']
+
+    def set(self, directory, fingerprint, items):
+        """
+            Saves the items read from a folder
+            Args:
+                - directory (str) path to folder
+                - fingerprint (tuple) fingerprint of folder's files (see get_fingerprint)
+                - items (list) data read from folder
+            Returns None
+        """
+        self.current[directory] = {'fingerprint': fingerprint, 'items': items}
+
+    def save(self):
+        """
+            Writes the folders read during this run to the snapshot file
+            Args: None
+            Returns None
+        """
+        print('Read {} of {} folders from snapshot'.format(self.hits, len(self.current)))
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'wb') as fobj:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'folders': self.current}, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
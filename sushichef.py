@@ -1,15 +1,18 @@
 #!/usr/bin/env python
 import os
-import sys
-from ricecooker.utils import downloader, html_writer
 from ricecooker.chefs import SushiChef
-from ricecooker.classes import nodes, files, questions, licenses
-from ricecooker.config import LOGGER              # Use LOGGER to print messages
+from ricecooker.classes import nodes, files, questions
+from ricecooker.config import LOGGER, get_storage_path  # Use LOGGER to print messages
 from ricecooker.exceptions import raise_for_invalid_channel
-from le_utils.constants import exercises, content_kinds, file_formats, format_presets, languages
+from le_utils.constants import exercises, content_kinds
 
-from config import DOWNLOAD_DIRECTORY, FOLDER
+from catalog import Catalog
+from config import FOLDER
 from pdf_splitter import PDFParser
+from profiling import PROFILE_MODES, Profiler, profile_book
+from snapshot import ChannelSnapshot
+from thumbnails import ThumbnailGenerator
+from validation import validate_data_files
 
 # Run constants
 ################################################################################
@@ -52,6 +55,11 @@ class MyChef(SushiChef):
     # pre_run: to perform preliminary tasks, e.g., crawling and scraping website
     # __init__: if need to customize functionality or add command line arguments
 
+    def __init__(self, *args, **kwargs):
+        super(MyChef, self).__init__(*args, **kwargs)
+        self.arg_parser.add_argument('--profile', choices=PROFILE_MODES, help="Profile each book and write the results to --profile-dir")
+        self.arg_parser.add_argument('--profile-dir', help="Directory to write profiles to (defaults to downloads/profiles)")
+
     def construct_channel(self, *args, **kwargs):
         """
         Creates ChannelNode and build topic tree
@@ -62,15 +70,29 @@ class MyChef(SushiChef):
             "fr" will be passed along to `construct_channel` as kwargs['lang'].
         Returns: ChannelNode
         """
+        # Check all of the -data.json files before building anything (books the catalog
+        # recorded and that haven't changed since only need their split pdfs checked)
+        catalog = Catalog()
+        errors = validate_data_files(FOLDER, catalog=catalog)
+        if errors:
+            raise OSError('Found {} problems in -data.json files:\n{}\n\nPlease edit files and try again'.format(len(errors), '\n'.join(errors)))
+
         channel = self.get_channel(*args, **kwargs)  # Create ChannelNode from data in self.channel_info
 
-        scrape_directory(channel, FOLDER)
+        # Thumbnails are rendered in the background while the tree is built, and
+        # folders that haven't changed since the last run are read from the snapshot
+        thumbnails = ThumbnailGenerator()
+        snapshot = ChannelSnapshot()
+        profiler = kwargs.get('profile') and Profiler(kwargs['profile'], directory=kwargs.get('profile_dir'))
+        scrape_directory(channel, FOLDER, thumbnails=thumbnails, snapshot=snapshot, catalog=catalog, profiler=profiler)
+        thumbnails.finish()
+        snapshot.save()
 
         raise_for_invalid_channel(channel)  # Check for errors in channel construction
 
         return channel
 
-def scrape_directory(topic, directory, indent=1):
+def scrape_directory(topic, directory, indent=1, thumbnails=None, snapshot=None, catalog=None, profiler=None):
     for subdirectory, folders, myfiles in os.walk(directory):
 
         # Go through all of the folders under directory
@@ -80,28 +102,73 @@ def scrape_directory(topic, directory, indent=1):
             topic.add_child(subtopic)
 
             # Go through folders under directory
-            scrape_directory(subtopic, os.sep.join([subdirectory,folder]),indent=indent+1)
-        for file in myfiles:
-            name,ext=os.path.splitext(file)
-            if ext=='.mp4':
-                video=nodes.VideoNode(source_id=subdirectory+file,title=name, license=LICENSE, copyright_holder=COPYRIGHT_HOLDER)
-                videofile=files.VideoFile(os.sep.join([subdirectory,file]))
+            scrape_directory(subtopic, os.sep.join([subdirectory,folder]),indent=indent+1, thumbnails=thumbnails, snapshot=snapshot, catalog=catalog, profiler=profiler)
+        for item in read_files(subdirectory, myfiles, snapshot=snapshot, catalog=catalog, profiler=profiler):
+            if item['kind'] == content_kinds.VIDEO:
+                video=nodes.VideoNode(source_id=item['source_id'],title=item['title'], license=LICENSE, copyright_holder=COPYRIGHT_HOLDER)
+                videofile=files.VideoFile(item['path'])
                 video.add_file(videofile)
                 topic.add_child(video)
-            elif ext == '.pdf':
-                with PDFParser(os.path.sep.join([subdirectory, file])) as parser:
-                    chapters = parser.get_data_file()
-                    generate_pdf_nodes(chapters, topic, source=os.path.basename(file))
+            elif item['kind'] == content_kinds.DOCUMENT:
+                with profile_book(profiler, '{}-nodes'.format(item['source'])):
+                    generate_pdf_nodes(item['chapters'], topic, source=item['source'], thumbnails=thumbnails)
+                    if profiler:
+                        profiler.stage('node build')
         break;
 
 
-def generate_pdf_nodes(data, topic, source=""):
+def read_files(directory, myfiles, snapshot=None, catalog=None, profiler=None):
+    """
+        Reads the videos and pdf data in a folder
+        Args:
+            - directory (str) path to folder
+            - myfiles (list) names of files in folder
+            - snapshot (ChannelSnapshot) snapshot to reuse unchanged folders from (optional)
+            - catalog (Catalog) catalog to record changed pdf data in (optional)
+            - profiler (Profiler) profiler to profile reading each book's data with (optional)
+        Returns list of video and document data
+    """
+    if snapshot:
+        fingerprint = snapshot.get_fingerprint(directory, myfiles)
+        items = snapshot.get(directory, fingerprint)
+        if items is not None:
+            return items
+
+    items = []
+    for file in myfiles:
+        name,ext=os.path.splitext(file)
+        if ext=='.mp4':
+            items.append({
+                'kind': content_kinds.VIDEO,
+                'source_id': directory+file,
+                'title': name,
+                'path': os.sep.join([directory,file]),
+            })
+        elif ext == '.pdf':
+            # Only the -data.json file is needed here, so there's no need to open the pdf
+            with profile_book(profiler, '{}-read'.format(file)):
+                parser = PDFParser(os.path.sep.join([directory, file]))
+                items.append({
+                    'kind': content_kinds.DOCUMENT,
+                    'source': os.path.basename(file),
+                    'chapters': parser.get_data_file(compact=True),
+                })
+                if catalog:
+                    catalog.import_files(parser)
+
+    if snapshot:
+        snapshot.set(directory, fingerprint, items)
+    return items
+
+
+def generate_pdf_nodes(data, topic, source="", thumbnails=None):
     """
         Generates nodes related to pdfs
         Args:
             - data (dict) data on pdf details (split pdfs, file paths, exercises, etc.)
             - topic (TopicNode) node to add sub nodes to
             - source (str) unique string associated with this pdf
+            - thumbnails (ThumbnailGenerator) generator to render document thumbnails with (optional)
         Returns None
     """
 
@@ -112,19 +179,22 @@ def generate_pdf_nodes(data, topic, source=""):
             source_id = "{}-{}".format(source, chapter['header'])
             subtopic = nodes.TopicNode(title=chapter['header'], source_id=source_id)
             topic.add_child(subtopic)
-            generate_pdf_nodes(chapter['chapters'], subtopic, source=source_id)
+            generate_pdf_nodes(chapter['chapters'], subtopic, source=source_id, thumbnails=thumbnails)
 
         # Create a document node and its related exercise nodes if it's a document
         elif chapter.get("chapter"):
             # Create doucment node
             source_id = "{}-{}".format(source, chapter['chapter'])
-            topic.add_child(nodes.DocumentNode(
+            document_node = nodes.DocumentNode(
                 title=chapter['chapter'],
                 source_id=source_id,
                 copyright_holder=COPYRIGHT_HOLDER,
                 license=LICENSE,
-                files=[files.DocumentFile(chapter['path'])]
-            ))
+                files=[StagedDocumentFile(chapter['path'], md5=chapter.get('md5'), size=chapter.get('size'), mtime=chapter.get('mtime'))]
+            )
+            topic.add_child(document_node)
+            if thumbnails:
+                thumbnails.add_thumbnail(document_node, chapter['path'])
 
             # Create exercise nodes
             for index, exercise in enumerate(chapter.get("exercises") or []):
@@ -139,39 +209,63 @@ def generate_pdf_nodes(data, topic, source=""):
                 topic.add_child(exercise_node)
                 create_exercise_questions(exercise_node, exercise.get('questions') or [])
 
+class StagedDocumentFile(files.DocumentFile):
+    """
+        DocumentFile for split pdfs that were already added to ricecooker's
+        storage by scripts/generatedata.py --stage, so the file doesn't need
+        to be read, hashed and copied again
+    """
+    def __init__(self, path, md5=None, size=None, mtime=None, **kwargs):
+        super(StagedDocumentFile, self).__init__(path, **kwargs)
+        self.md5 = md5          # md5 of split pdf when it was staged
+        self.size = size        # Size of split pdf when it was staged
+        self.mtime = mtime      # Modified time of split pdf when it was staged
+
+    def process_file(self):
+        if self.md5 and self.size is not None and self.mtime is not None and os.path.exists(self.path):
+            filename = '{}.pdf'.format(self.md5)
+            storage_path = get_storage_path(filename)
+
+            # Only use the stored file if the split pdf hasn't been rewritten since it was staged (the stored
+            # file may be a hardlink to the split pdf, so it changes along with it and can't be trusted alone)
+            stat = os.stat(self.path)
+            if (stat.st_size, stat.st_mtime) == (self.size, self.mtime) and \
+                    os.path.exists(storage_path) and os.path.getsize(storage_path) == self.size:
+                self.filename = filename
+                return self.filename
+        return super(StagedDocumentFile, self).process_file()
+
 def create_exercise_questions(exercise_node, exercise_data):
     """
         Generates exercise questions based on data
         Args:
             - exercise_node (ExerciseNode) node to add questions to
-            - exercise_data (dict) data regarding exercises to create
+            - exercise_data (list) ExerciseQuestion objects to create questions from
         Returns None
     """
+    # Generate a unique assessment_id for each question
+    assessment_prefix = "{}- ".format(exercise_node.source_id)
+
     # Iterate through exercise question data
     for question_index, question in enumerate(exercise_data):
-        # Generate a unique assessment_id for each question
-        assessment_id = "{}- {}".format(exercise_node.source_id, question_index)
-
-        # Filter list of answers to be added to the questions
-        correct_answers = [answer for answer, correct in question['answers'].items() if correct]
-        all_answers = [answer for answer, _ in question['answers'].items()]
+        assessment_id = assessment_prefix + str(question_index)
 
         # Create a multiple selection question if specified
-        if question["type"] == exercises.MULTIPLE_SELECTION:
+        if question.type == exercises.MULTIPLE_SELECTION:
             exercise_node.add_question(questions.MultipleSelectQuestion(
                 id=assessment_id,
-                question=question['question'],
-                correct_answers=correct_answers,
-                all_answers=all_answers,
+                question=question.question,
+                correct_answers=question.correct_answers,
+                all_answers=question.all_answers,
             ))
 
         # Create a single selection question if specified
-        elif question["type"] == exercises.SINGLE_SELECTION:
+        elif question.type == exercises.SINGLE_SELECTION:
             exercise_node.add_question(questions.SingleSelectQuestion(
                 id=assessment_id,
-                question=question['question'],
-                correct_answer=correct_answers[0],
-                all_answers=all_answers
+                question=question.question,
+                correct_answer=question.correct_answers[0],
+                all_answers=question.all_answers
             ))
 
 # CLI
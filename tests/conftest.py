@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Make the top-level modules, scripts and examples importable from the tests
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'examples'))
+sys.path.append(os.path.join(ROOT, 'scripts'))
@@ -0,0 +1,98 @@
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+import os
+import threading
+
+import pytest
+
+from assetfetcher import AssetFetcher
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        CountingHandler.requests.append(self.path)
+        return super(CountingHandler, self).do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    """ Serves tmp_path/site over http on a free port """
+    site = tmp_path / 'site'
+    (site / 'a').mkdir(parents=True)
+    (site / 'b').mkdir(parents=True)
+    (site / 'a' / 'logo.png').write_bytes(b'image a')
+    (site / 'b' / 'logo.png').write_bytes(b'image b')
+    (site / 'style.css').write_bytes(b'body {}')
+    CountingHandler.requests = []
+
+    httpd = HTTPServer(('127.0.0.1', 0), partial(CountingHandler, directory=str(site)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = AssetFetcher(directory=str(tmp_path / 'cache'), workers=4)
+    yield fetcher
+    fetcher.close()
+
+
+def test_same_url_is_downloaded_once(server, fetcher):
+    futures = [fetcher.fetch(server + '/style.css') for _ in range(10)]
+    assert len({id(future) for future in futures}) == 1
+    assert open(futures[0].result(), 'rb').read() == b'body {}'
+    assert CountingHandler.requests == ['/style.css']
+
+
+def test_same_url_twice_on_a_page(server, fetcher, tmp_path):
+    destpath = str(tmp_path / 'page')
+    first = fetcher.copy_to(server + '/style.css', destpath)
+    second = fetcher.copy_to(server + '/style.css', destpath)
+    assert first == second
+    assert open(os.path.join(destpath, first), 'rb').read() == b'body {}'
+
+
+def test_urls_with_the_same_basename_keep_their_content(server, fetcher, tmp_path):
+    destpath = str(tmp_path / 'page')
+    path_a = fetcher.copy_to(server + '/a/logo.png', destpath)
+    path_b = fetcher.copy_to(server + '/b/logo.png', destpath)
+    assert path_a != path_b
+    assert path_a.endswith('.png')
+    assert open(os.path.join(destpath, path_a), 'rb').read() == b'image a'
+    assert open(os.path.join(destpath, path_b), 'rb').read() == b'image b'
+
+    # The cache still holds each asset's own content
+    assert open(fetcher.fetch(server + '/a/logo.png').result(), 'rb').read() == b'image a'
+    assert open(fetcher.fetch(server + '/b/logo.png').result(), 'rb').read() == b'image b'
+
+
+def test_cache_is_reused_across_runs(server, tmp_path):
+    directory = str(tmp_path / 'cache')
+    fetcher = AssetFetcher(directory=directory)
+    fetcher.fetch(server + '/style.css').result()
+    fetcher.close()
+
+    fetcher = AssetFetcher(directory=directory)
+    assert open(fetcher.fetch(server + '/style.css').result(), 'rb').read() == b'body {}'
+    fetcher.close()
+    assert CountingHandler.requests == ['/style.css']
+
+
+def test_copy_falls_back_when_links_fail(server, fetcher, tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError('cross-device link')
+    monkeypatch.setattr(os, 'link', fail)
+
+    destpath = str(tmp_path / 'page')
+    path_a = fetcher.copy_to(server + '/a/logo.png', destpath)
+    fetcher.copy_to(server + '/a/logo.png', destpath)
+    assert open(os.path.join(destpath, path_a), 'rb').read() == b'image a'
+    assert open(fetcher.fetch(server + '/a/logo.png').result(), 'rb').read() == b'image a'
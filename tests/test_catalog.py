@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+from catalog import Catalog
+from pdf_splitter import PDFParser
+
+
+def write_json(path, data):
+    with open(path, 'wb') as fobj:
+        fobj.write(json.dumps(data).encode('utf-8'))
+
+
+@pytest.fixture
+def book(tmp_path):
+    """ Returns a parser for a pdf with -index.json and -data.json files (the pdf itself is never opened) """
+    pdf_path = str(tmp_path / 'book.pdf')
+    open(pdf_path, 'wb').close()
+    parser = PDFParser(pdf_path, directory=str(tmp_path / 'downloads'))
+    write_json(parser.index_path, {"offset": 0, "chapters": {"Chapter 1": 1}})
+    write_json(parser.pdf_data_path, [{"header": "Section", "chapters": [
+        {"chapter": "Chapter 1", "path": pdf_path, "exercises": []},
+    ]}])
+    return parser
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return Catalog(str(tmp_path / 'catalog.sqlite3'))
+
+
+def test_export_skips_files_edited_since_import(book, catalog):
+    catalog.import_files(book)
+    write_json(book.pdf_data_path, [{"chapter": "Edited", "path": book.download_url}])
+    os.utime(book.pdf_data_path, (1, 1))
+
+    assert catalog.export_files(book) == [book.index_path]
+    with open(book.pdf_data_path, 'rb') as fobj:
+        assert json.loads(fobj.read().decode('utf-8'))[0]['chapter'] == 'Edited'
+
+
+def test_export_restores_deleted_files(book, catalog):
+    catalog.import_files(book)
+    os.remove(book.pdf_data_path)
+
+    assert book.pdf_data_path in catalog.export_files(book)
+    assert os.path.exists(book.pdf_data_path)
+
+
+def test_import_keeps_recorded_page_ranges(book, catalog):
+    with open(book.pdf_data_path, 'rb') as fobj:
+        catalog.save_data(book, fobj.read().decode('utf-8'), page_ranges=[
+            {"header": "Section", "chapters": [{"chapter": "Chapter 1", "start": 2, "end": 7, "folder": "Section"}]},
+        ])
+
+    # Re-import an edited -data.json file
+    write_json(book.pdf_data_path, [{"header": "Section", "chapters": [
+        {"chapter": "Chapter 1", "path": book.download_url, "exercises": [{"description": "New", "questions": []}]},
+    ]}])
+    os.utime(book.pdf_data_path, (1, 1))
+    assert book.pdf_data_path in catalog.import_files(book)
+
+    row = catalog.connection.execute("SELECT start_page, end_page FROM chapters").fetchone()
+    assert (row['start_page'], row['end_page']) == (2, 7)
+
+
+def test_data_is_rebuilt_from_chapters_and_exercises(book, catalog):
+    data = [
+        {"chapter": "Intro", "path": "intro.pdf", "exercises": []},
+        {"header": "Part", "chapters": [
+            {"header": "Section", "chapters": [
+                {"chapter": "Chapter 1", "path": "one.pdf", "md5": "abc", "size": 10, "mtime": 1.5, "exercises": [
+                    {"description": "Quiz", "questions": [{"question": "Q", "type": "single_selection", "answers": {"A": True, "B": False}}]},
+                ]},
+                {"chapter": "Chapter 2", "path": "two.pdf", "exercises": []},
+            ]},
+            {"chapter": "Chapter 3", "path": "three.pdf", "exercises": []},
+        ]},
+    ]
+    write_json(book.pdf_data_path, data)
+    catalog.import_files(book)
+
+    # Make sure the catalog's copy is used instead of the file
+    catalog.connection.execute("UPDATE exercises SET description = 'From catalog'")
+    data[1]['chapters'][0]['chapters'][0]['exercises'][0]['description'] = 'From catalog'
+    assert catalog.get_data(book) == data
+
+
+def test_data_is_not_rebuilt_once_file_changes(book, catalog):
+    catalog.import_files(book)
+    write_json(book.pdf_data_path, [{"chapter": "Edited", "path": book.download_url}])
+    os.utime(book.pdf_data_path, (1, 1))
+
+    assert catalog.get_data(book) is None
+    assert book.get_data_file() == [{"chapter": "Edited", "path": book.download_url}]
+
+
+def test_has_data_until_file_changes(book, catalog):
+    assert not catalog.has_data(book)
+    catalog.import_files(book)
+    assert catalog.has_data(book)
+
+    os.utime(book.pdf_data_path, (1, 1))
+    assert not catalog.has_data(book)
+
+
+def test_chapter_paths_are_listed_with_their_sections(book, catalog):
+    catalog.import_files(book)
+    assert catalog.get_chapter_paths(book) == [(['Section'], 'Chapter 1', book.download_url)]
+
+
+def test_chapters_keep_recorded_md5_and_size(book, catalog):
+    write_json(book.pdf_data_path, [{"chapter": "Chapter 1", "path": "missing.pdf", "md5": "abc", "size": 10, "mtime": 1.5}])
+    catalog.import_files(book)
+
+    row = catalog.connection.execute("SELECT md5, size, mtime FROM chapters").fetchone()
+    assert tuple(row) == ('abc', 10, 1.5)
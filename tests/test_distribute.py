@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+import distribute
+from jobqueue import SQLiteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(distribute, 'run_task', lambda path, task, **options: path)
+    return SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+
+def start_worker(queue, **options):
+    # Each thread needs its own connection
+    def run():
+        distribute.work(SQLiteJobQueue(queue.path), None, poll_interval=0.01, **options)
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    return worker
+
+
+def test_worker_waits_for_coordinator_to_add_jobs(queue):
+    worker = start_worker(queue)
+    time.sleep(0.1)
+    assert worker.is_alive()
+
+    queue.set_open(True)
+    queue.add_job('book.pdf', 'data')
+    while queue.get_counts().get('pending'):
+        time.sleep(0.01)
+    queue.set_open(False)
+
+    worker.join(5)
+    assert not worker.is_alive()
+    assert queue.get_counts() == {'done': 1}
+
+
+def test_worker_ignores_queue_closed_by_earlier_run(queue):
+    queue.set_open(False)
+    worker = start_worker(queue, idle_timeout=0.3)
+    time.sleep(0.1)
+    assert worker.is_alive()
+
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_second_coordinator_run_runs_every_pdf_again(queue, monkeypatch):
+    runs = []
+    monkeypatch.setattr(distribute, 'run_task', lambda path, task, **options: runs.append(path))
+    monkeypatch.setattr(distribute, 'find_pdfs', lambda directory: ['book.pdf'])
+    monkeypatch.setattr(distribute, 'HEARTBEAT_INTERVAL', 0.01)
+
+    for run in range(2):
+        worker = start_worker(queue)
+        assert distribute.coordinate(queue, None, 'data') == []
+        worker.join(5)
+        assert not worker.is_alive()
+        assert queue.get_counts() == {'done': 1}
+    assert runs == ['book.pdf', 'book.pdf']
@@ -0,0 +1,34 @@
+import pytest
+
+from jobqueue import JobQueue, SQLiteJobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=2)
+
+
+def test_job_queue_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_failed_jobs_are_retried_until_out_of_attempts(queue):
+    queue.add_job('book.pdf', 'data')
+    queue.add_job('book.pdf', 'data')
+
+    for attempt in range(2):
+        job = queue.claim_job('worker')
+        assert (job['path'], job['attempts']) == ('book.pdf', attempt + 1)
+        assert queue.claim_job('other') is None
+        queue.finish_job(job['id'], 'worker', error='Traceback')
+
+    assert queue.get_counts() == {'failed': 1}
+    assert [job['path'] for job in queue.get_failures()] == ['book.pdf']
+
+
+def test_stale_jobs_are_handed_out_again(queue):
+    queue.add_job('book.pdf', 'data')
+    job = queue.claim_job('worker')
+    assert queue.requeue_stale_jobs(-1) == 1
+    assert queue.claim_job('other')['id'] == job['id']
@@ -0,0 +1,75 @@
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from functools import partial
+import json
+import os
+import threading
+
+import pytest
+
+# The example chef needs ricecooker and its scraping dependencies
+for module in ['ricecooker', 'bs4', 'selenium']:
+    pytest.importorskip(module)
+
+import openstax_sushichef
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        CountingHandler.requests.append(self.path)
+        return super(CountingHandler, self).do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    """ Serves a stand-in for the Open Stax api and covers from tmp_path/site on a free port """
+    site = tmp_path / 'site'
+    (site / 'api').mkdir(parents=True)
+    for slug in ['algebra', 'biology']:
+        (site / 'api' / slug).write_bytes(json.dumps({'slug': slug, 'title': slug.title()}).encode('utf-8'))
+    (site / 'cover.png').write_bytes(b'\x89PNG cover')
+    (site / 'cover').write_bytes(b'\xff\xd8 jpeg cover')
+    (site / 'cover.gif').write_bytes(b'GIF89a cover')
+    CountingHandler.requests = []
+
+    httpd = HTTPServer(('127.0.0.1', 0), partial(CountingHandler, directory=str(site)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_book_details_are_read_in_order(server):
+    books = [{'slug': 'biology'}, {'slug': 'algebra'}]
+    details = openstax_sushichef.read_book_details(books, baseurl='{}/api'.format(server), workers=2)
+    assert [book['title'] for book in details] == ['Biology', 'Algebra']
+
+
+def test_covers_are_saved_with_their_format(server, tmp_path):
+    renderer = openstax_sushichef.ThumbnailRenderer(directory=str(tmp_path))
+    try:
+        png_path = renderer.render('{}/cover.png'.format(server)).result()
+        jpg_path = renderer.render('{}/cover'.format(server)).result()
+        assert renderer.render('{}/cover.png'.format(server)).result() == png_path
+    finally:
+        renderer.finish()
+
+    assert os.path.splitext(png_path)[1] == '.png' and os.path.splitext(jpg_path)[1] == '.jpg'
+    with open(png_path, 'rb') as fobj:
+        assert fobj.read() == b'\x89PNG cover'
+    assert CountingHandler.requests.count('/cover.png') == 1
+
+
+def test_covers_in_other_formats_are_skipped(server, tmp_path):
+    renderer = openstax_sushichef.ThumbnailRenderer(directory=str(tmp_path))
+    try:
+        with pytest.raises(ValueError):
+            renderer.render('{}/cover.gif'.format(server)).result()
+    finally:
+        renderer.finish()
+    assert not any(path.name.startswith('cover-') for path in tmp_path.iterdir())
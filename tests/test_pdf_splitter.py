@@ -0,0 +1,152 @@
+import glob
+import json
+import os
+
+import pytest
+from PyPDF2 import PdfFileWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from pdf_splitter import TIKA_TIMEOUT, Chapter, PDFParser, TikaError, read_with_tika
+from scheduler import is_transient_error
+
+
+@pytest.fixture
+def book(tmp_path):
+    """ Returns a parser for a pdf with an -index.json file (the pdf itself is never opened) """
+    pdf_path = str(tmp_path / 'book.pdf')
+    open(pdf_path, 'wb').close()
+    parser = PDFParser(pdf_path, directory=str(tmp_path / 'downloads'))
+    with open(parser.index_path, 'wb') as fobj:
+        fobj.write(b'{"offset": 0, "chapters": {"Edited": 1}}')
+    return parser
+
+
+def get_backups(path):
+    """ Returns the contents of every backup of a file """
+    directory, filename = os.path.split(path)
+    backups = []
+    for backup in sorted(glob.glob(os.path.join(glob.escape(directory), '{}.*.bak'.format(glob.escape(filename))))):
+        with open(backup, 'rb') as fobj:
+            backups.append(fobj.read().decode('utf-8'))
+    return backups
+
+
+def test_index_is_kept_if_pdf_is_older(book):
+    os.utime(book.download_url, (1, 1))
+    assert book.generate_index_file('.') == book.index_path
+    assert get_backups(book.index_path) == []
+
+
+def test_index_is_regenerated_if_pdf_is_newer(book, monkeypatch):
+    os.utime(book.index_path, (1, 1))
+    monkeypatch.setattr(book, 'get_index_range', lambda index_delimiter: (-1, -1))  # No index found in the new pdf
+
+    assert book.generate_index_file('.') is None
+    assert len(get_backups(book.index_path)) == 1 and 'Edited' in get_backups(book.index_path)[0]
+
+
+def test_regenerating_twice_keeps_the_edited_index(book, monkeypatch):
+    monkeypatch.setattr(book, 'get_index_range', lambda index_delimiter: (0, 1))
+    monkeypatch.setattr(book, 'get_pages_text', lambda pages: ['Generated ..... 2'])
+    for _ in range(2):
+        os.utime(book.index_path, (1, 1))
+        assert book.generate_index_file('.') == book.index_path
+
+    backups = get_backups(book.index_path)
+    assert len(backups) == 2
+    assert any('Edited' in backup for backup in backups)
+
+
+INDEX_PAGES = os.path.join(os.path.dirname(__file__), 'index_pages')
+
+
+@pytest.mark.parametrize('name', sorted(os.path.splitext(f)[0] for f in os.listdir(INDEX_PAGES) if f.endswith('.txt')))
+def test_parse_index_page(book, name):
+    """ Each index_pages/<name>.txt holds index pages (separated by form feeds) and <name>.json the chapters they should give """
+    with open(os.path.join(INDEX_PAGES, '{}.txt'.format(name)), 'rb') as fobj:
+        pages = fobj.read().decode('utf-8').split('\f')
+    with open(os.path.join(INDEX_PAGES, '{}.json'.format(name)), 'rb') as fobj:
+        expected = json.loads(fobj.read().decode('utf-8'))
+
+    root_chapter = Chapter(book.download_url)
+    current_section = None
+    for page in pages:
+        current_section = book.parse_index_page(page, '.', root_chapter, current_section)
+    assert root_chapter.to_dict()[book.download_url] == expected
+
+
+def test_strings_to_ignore_can_be_set_per_book(book):
+    assert not book.is_valid_chapter('Índice')
+    book.strings_to_ignore = ['Contenido']
+    assert book.is_valid_chapter('Índice')
+    assert not book.is_valid_chapter('Contenido')
+    assert not PDFParser(book.download_url).is_valid_chapter('Índice')
+
+
+def add_stream(writer, data, **entries):
+    """ Adds a content stream with the given dictionary entries to a pdf and returns a reference to it """
+    stream = DecodedStreamObject()
+    stream.setData(data)
+    stream.update({NameObject(key): value for key, value in entries.items()})
+    return writer._addObject(stream)
+
+
+@pytest.fixture
+def text_layer_pdf(tmp_path):
+    """ Returns the path to a pdf with a text page, an image-only page and a page that draws its text with a form """
+    writer = PdfFileWriter()
+    image = add_stream(writer, b'BT ET', **{'/Type': NameObject('/XObject'), '/Subtype': NameObject('/Image'),
+                                            '/Width': NumberObject(1), '/Height': NumberObject(1)})
+    form = add_stream(writer, b'BT (Form text) Tj ET', **{'/Type': NameObject('/XObject'), '/Subtype': NameObject('/Form'),
+                                                          '/BBox': ArrayObject([NumberObject(0)] * 4)})
+    for contents, xobjects in [(b'BT (Page text) Tj ET', {}), (b'q /Im1 Do Q', {'/Im1': image}), (b'q /Fm1 Do Q', {'/Fm1': form})]:
+        page = writer.addBlankPage(100, 100)
+        page[NameObject('/Contents')] = add_stream(writer, contents)
+        page[NameObject('/Resources')] = DictionaryObject({NameObject('/XObject'): DictionaryObject(
+            {NameObject(key): value for key, value in xobjects.items()})})
+
+    pdf_path = str(tmp_path / 'sample.pdf')
+    with open(pdf_path, 'wb') as fobj:
+        writer.write(fobj)
+    return pdf_path
+
+
+def test_text_layer_is_found_in_pages_and_forms(text_layer_pdf, tmp_path):
+    with PDFParser(text_layer_pdf, directory=str(tmp_path / 'downloads')) as parser:
+        assert [parser.has_text(index) for index in range(parser.pdf.numPages)] == [True, False, True]
+
+
+def test_plan_only_checks_text_if_asked(text_layer_pdf, tmp_path):
+    with PDFParser(text_layer_pdf, directory=str(tmp_path / 'downloads')) as parser:
+        with open(parser.index_path, 'wb') as fobj:
+            fobj.write(b'{"offset": 0, "chapters": {"Text": 1, "Image": 2, "Form": 3}}')
+
+        plan = parser.plan_data_file()
+        assert parser.text_pages == {} and plan['text_free_pages'] is None
+        assert plan['tika_calls'] == 3
+
+        plan = parser.plan_data_file(check_text=True)
+        assert plan['text_free_pages'] == 1
+        assert plan['tika_calls'] == 2
+
+
+@pytest.mark.parametrize('status, response', [(503, 'Service Unavailable'), (200, 'Not json')])
+def test_tika_errors_are_raised_as_transient(monkeypatch, status, response):
+    from tika import tika
+    monkeypatch.setattr(tika, 'callServer', lambda *args, **kwargs: (status, response))
+
+    with pytest.raises(TikaError) as error:
+        read_with_tika(b'%PDF')
+    assert is_transient_error(error.value)
+
+
+def test_tika_requests_time_out(monkeypatch):
+    from tika import tika
+    requests = []
+    def call_server(verb, endpoint, service, data, headers, verbose, httpVerbs):
+        requests.append((service, httpVerbs[verb].keywords))
+        return (200, json.dumps([{"X-TIKA:content": "Text"}]))
+    monkeypatch.setattr(tika, 'callServer', call_server)
+
+    assert read_with_tika(b'%PDF', xml=True) == 'Text'
+    assert requests == [('/rmeta/xml', {'timeout': TIKA_TIMEOUT})]
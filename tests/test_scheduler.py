@@ -0,0 +1,27 @@
+import os
+
+from scheduler import BookScheduler
+
+
+def run_fake_book(path):
+    """ Stands in for run_book (the worker dies on any path named crash) """
+    if os.path.basename(path) == 'crash':
+        os._exit(1)
+    return {'result': path}
+
+
+class FakeScheduler(BookScheduler):
+    def submit(self, executor, path):
+        return executor.submit(run_fake_book, path)
+
+
+def test_dead_worker_is_recorded_and_others_continue():
+    scheduler = FakeScheduler('data', workers=1, retries=1, backoff=0)
+    failures = scheduler.run(['one', 'crash', 'two', 'three'])
+
+    assert sorted(scheduler.succeeded) == ['one', 'three', 'two']
+    assert [(failure['pdf'], failure['type'], failure['attempts']) for failure in failures] == [('crash', 'BrokenProcessPool', 2)]
+
+
+def test_default_workers_leave_cpus_free():
+    assert 1 <= BookScheduler('data').workers <= max(1, os.cpu_count() // 2)
@@ -0,0 +1,43 @@
+import os
+
+from pdf_splitter import ExerciseQuestion
+from snapshot import ChannelSnapshot
+
+
+def write_file(path, text):
+    with open(path, 'w') as fobj:
+        fobj.write(text)
+
+
+def test_unchanged_folders_are_read_from_last_run(tmp_path):
+    directory = str(tmp_path)
+    path = os.path.sep.join([directory, 'snapshot.pickle'])
+    write_file(os.path.sep.join([directory, 'book-data.json']), '[]')
+    items = [{'chapters': [{'questions': [ExerciseQuestion('Q', 'single_selection', {'A': True, 'B': False})]}]}]
+
+    snapshot = ChannelSnapshot(path)
+    fingerprint = snapshot.get_fingerprint(directory, ['book-data.json'])
+    assert snapshot.get(directory, fingerprint) is None
+    snapshot.set(directory, fingerprint, items)
+    snapshot.save()
+
+    snapshot = ChannelSnapshot(path)
+    question = snapshot.get(directory, snapshot.get_fingerprint(directory, ['book-data.json']))[0]['chapters'][0]['questions'][0]
+    assert (question.question, question.correct_answers, question.all_answers) == ('Q', ['A'], ['A', 'B'])
+    assert snapshot.hits == 1
+
+
+def test_folders_are_read_again_once_data_file_changes(tmp_path):
+    directory = str(tmp_path)
+    path = os.path.sep.join([directory, 'snapshot.pickle'])
+    data_path = os.path.sep.join([directory, 'book-data.json'])
+    write_file(data_path, '[]')
+
+    snapshot = ChannelSnapshot(path)
+    snapshot.set(directory, snapshot.get_fingerprint(directory, ['book-data.json']), [{'chapters': []}])
+    snapshot.save()
+
+    os.utime(data_path, (1, 1))
+    snapshot = ChannelSnapshot(path)
+    assert snapshot.get(directory, snapshot.get_fingerprint(directory, ['book-data.json'])) is None
+    assert snapshot.hits == 0
@@ -0,0 +1,17 @@
+import os
+
+from thumbnails import ThumbnailGenerator
+
+
+def test_thumbnails_are_rendered_again_once_pdf_changes(tmp_path):
+    pdf_path = str(tmp_path / 'chapter.pdf')
+    with open(pdf_path, 'wb') as fobj:
+        fobj.write(b'%PDF')
+    thumbnails = ThumbnailGenerator(directory=str(tmp_path / 'thumbnails'))
+
+    thumbnail_path = thumbnails.get_thumbnail_path(pdf_path)
+    assert thumbnails.get_thumbnail_path(pdf_path) == thumbnail_path
+
+    os.utime(pdf_path, (1, 1))
+    assert thumbnails.get_thumbnail_path(pdf_path) != thumbnail_path
+    thumbnails.finish()
@@ -0,0 +1,77 @@
+import threading
+import types
+
+from watcher import DirectoryWatcher
+
+
+def test_changes_are_grouped_until_they_settle(tmp_path):
+    pdf_path = str(tmp_path / 'book.pdf')
+    open(pdf_path, 'wb').close()
+    watcher = DirectoryWatcher(str(tmp_path), suffixes=('.pdf', '-index.json'), debounce=60)
+
+    watcher.add_change(pdf_path)
+    watcher.add_change(str(tmp_path / 'book-index.json'))
+    assert watcher.get_ready() == []
+
+    watcher.debounce = 0
+    assert watcher.get_ready() == [pdf_path]
+    assert watcher.get_ready() == []
+
+
+def test_changes_from_another_thread_are_not_lost(tmp_path):
+    pdf_paths = []
+    for index in range(50):
+        pdf_paths.append(str(tmp_path / 'book{}.pdf'.format(index)))
+        open(pdf_paths[-1], 'wb').close()
+    watcher = DirectoryWatcher(str(tmp_path), debounce=0)
+
+    # watchdog calls add_change from its own thread while the main thread collects ready pdfs
+    def add_changes():
+        for _ in range(20):
+            for path in pdf_paths:
+                watcher.add_change(path)
+    thread = threading.Thread(target=add_changes)
+    thread.start()
+    ready = set()
+    while thread.is_alive():
+        ready.update(watcher.get_ready())
+    thread.join()
+    ready.update(watcher.get_ready())
+
+    assert ready == set(pdf_paths)
+
+
+def make_event(event_type, path, dest_path=''):
+    """ Stands in for a watchdog event """
+    return types.SimpleNamespace(event_type=event_type, src_path=path, dest_path=dest_path, is_directory=False)
+
+
+def test_opening_or_reading_a_file_is_not_a_change(tmp_path):
+    pdf_path = str(tmp_path / 'book.pdf')
+    open(pdf_path, 'wb').close()
+    watcher = DirectoryWatcher(str(tmp_path), suffixes=('.pdf', '-index.json'), debounce=0)
+
+    # Regenerating a book opens and reads its pdf and -index.json file
+    for event_type in ('opened', 'closed_no_write'):
+        watcher.handle_event(make_event(event_type, pdf_path))
+        watcher.handle_event(make_event(event_type, str(tmp_path / 'book-index.json')))
+    assert watcher.get_ready() == []
+
+    # Reading the files doesn't change what polling sees either
+    watcher.files = watcher.scan()
+    with open(pdf_path, 'rb') as fobj:
+        fobj.read()
+    watcher.poll()
+    assert watcher.get_ready() == []
+
+
+def test_writing_a_file_is_a_change(tmp_path):
+    pdf_path = str(tmp_path / 'book.pdf')
+    open(pdf_path, 'wb').close()
+    watcher = DirectoryWatcher(str(tmp_path), suffixes=('.pdf', '-index.json'), debounce=0)
+
+    for event_type in ('created', 'modified', 'closed'):
+        watcher.handle_event(make_event(event_type, str(tmp_path / 'book-index.json')))
+        assert watcher.get_ready() == [pdf_path]
+    watcher.handle_event(make_event('moved', str(tmp_path / 'book.tmp'), dest_path=pdf_path))
+    assert watcher.get_ready() == [pdf_path]
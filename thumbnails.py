@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+from config import DOWNLOAD_DIRECTORY
+
+
+class ThumbnailGenerator(object):
+    """
+        The ThumbnailGenerator object renders the first page of split pdfs
+        as thumbnails in the background while the channel tree is being built.
+        Thumbnails are cached by the pdf's path, size and modified time, so
+        unchanged chapters are only rendered once
+
+        ---
+
+        Note: rendering uses pdftoppm (from poppler), so thumbnails are
+        skipped if it isn't installed
+    """
+    def __init__(self, directory=None, size=400, workers=4):
+        self.directory = directory or os.path.sep.join([DOWNLOAD_DIRECTORY, 'thumbnails'])
+        self.size = size                    # Width/height in pixels of the largest side
+        self.pdftoppm = shutil.which('pdftoppm')
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []                   # List of (node, future) waiting for thumbnails
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        if not self.pdftoppm:
+            print('WARNING: pdftoppm is not installed, so thumbnails will not be generated')
+
+    def get_thumbnail_path(self, pdf_path):
+        """
+            Returns where the thumbnail for a pdf is cached
+            Args: pdf_path (str) path to pdf
+            Returns str path to png file
+        """
+        # Only stat the pdf, since hashing every split pdf on every run is slower than rendering the few that changed
+        stat = os.stat(pdf_path)
+        key = '{}:{}:{}'.format(os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        return os.path.sep.join([self.directory, '{}-{}.png'.format(hashlib.sha1(key.encode('utf-8')).hexdigest(), self.size)])
+
+    def render(self, pdf_path):
+        """
+            Renders the first page of a pdf if it hasn't already been rendered
+            Args: pdf_path (str) path to pdf
+            Returns str path to png file (None if the page couldn't be rendered)
+        """
+        thumbnail_path = self.get_thumbnail_path(pdf_path)
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+
+        # Render to a temporary file so a failed render isn't cached
+        output_prefix = os.path.join(tempfile.mkdtemp(dir=self.directory), 'thumbnail')
+        try:
+            subprocess.check_call([
+                self.pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1',
+                '-scale-to', str(self.size), pdf_path, output_prefix
+            ])
+            os.replace('{}.png'.format(output_prefix), thumbnail_path)
+            return thumbnail_path
+        except (OSError, subprocess.CalledProcessError) as e:
+            print('WARNING: Unable to generate thumbnail for {} ({})'.format(pdf_path, str(e)))
+        finally:
+            shutil.rmtree(os.path.dirname(output_prefix), ignore_errors=True)
+
+    def add_thumbnail(self, node, pdf_path):
+        """
+            Queues a thumbnail to be rendered for a node
+            Args:
+                - node (Node) node to add thumbnail to
+                - pdf_path (str) path to pdf to render thumbnail from
+            Returns None
+        """
+        if self.pdftoppm:
+            self.pending.append((node, self.executor.submit(self.render, pdf_path)))
+
+    def finish(self):
+        """
+            Waits for queued thumbnails and adds them to their nodes
+            Args: None
+            Returns None
+        """
+        for node, future in self.pending:
+            thumbnail_path = future.result()
+            if thumbnail_path:
+                node.set_thumbnail(thumbnail_path)
+        self.pending = []
+        self.executor.shutdown()
@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+from le_utils.constants import exercises
+
+from pdf_splitter import PDFParser
+
+# Question types the chef can turn into questions (see sushichef.create_exercise_questions)
+QUESTION_TYPES = [exercises.SINGLE_SELECTION, exercises.MULTIPLE_SELECTION]
+
+
+def validate_data_file(pdf_path):
+    """
+        Checks a pdf's -data.json file for problems that would stop the chef
+        Args: pdf_path (str) path to pdf
+        Returns list of str error messages
+    """
+    parser = PDFParser(pdf_path)
+    try:
+        data = parser.get_data_file()
+    except OSError as e:
+        return [str(e).split('\n')[0]]
+
+    if not isinstance(data, list):
+        return ['{}: expected a list of sections and chapters'.format(parser.pdf_data_path)]
+    return validate_chapters(data, parser.pdf_data_path)
+
+def validate_chapters(data, location):
+    """
+        Checks the sections and chapters from a -data.json file
+        Args:
+            - data (list) sections and chapters to check
+            - location (str) where the data is from (used in error messages)
+        Returns list of str error messages
+    """
+    errors = []
+    titles = set()
+    for chapter in data:
+        title = isinstance(chapter, dict) and (chapter.get('header') or chapter.get('chapter'))
+        if not title:
+            errors.append('{}: every item needs a "header" or "chapter" name'.format(location))
+            continue
+
+        # Items at the same level share a topic, so their names become their source_ids
+        if title in titles:
+            errors.append('{} > {}: name is used more than once'.format(location, title))
+        titles.add(title)
+
+        if chapter.get('header'):
+            if not isinstance(chapter.get('chapters'), list):
+                errors.append('{} > {}: "chapters" must be a list'.format(location, title))
+            else:
+                errors.extend(validate_chapters(chapter['chapters'], '{} > {}'.format(location, title)))
+            continue
+
+        if not chapter.get('path') or not os.path.exists(chapter['path']):
+            errors.append('{} > {}: split pdf {} does not exist'.format(location, title, chapter.get('path')))
+        for index, exercise in enumerate(chapter.get('exercises') or []):
+            errors.extend(validate_exercise(exercise, '{} > {} > exercise {}'.format(location, title, index + 1)))
+    return errors
+
+def validate_exercise(exercise, location):
+    """
+        Checks the questions in an exercise
+        Args:
+            - exercise (dict) exercise to check
+            - location (str) where the exercise is from (used in error messages)
+        Returns list of str error messages
+    """
+    errors = []
+    for index, question in enumerate(exercise.get('questions') or []):
+        question_location = '{} > question {}'.format(location, index + 1)
+        if not isinstance(question, dict) or not str(question.get('question') or '').strip():
+            errors.append('{}: question text is missing'.format(question_location))
+            continue
+        if question.get('type') not in QUESTION_TYPES:
+            errors.append('{}: type must be one of {}'.format(question_location, ', '.join(QUESTION_TYPES)))
+        answers = question.get('answers')
+        if not isinstance(answers, dict) or not answers:
+            errors.append('{}: answers are missing'.format(question_location))
+        elif any(not str(answer).strip() for answer in answers):
+            errors.append('{}: answers cannot be blank'.format(question_location))
+        elif not any(answers.values()):
+            errors.append('{}: no answer is marked as correct'.format(question_location))
+    return errors
+
+def validate_chapter_paths(parser, catalog):
+    """
+        Checks that the split pdfs the catalog recorded for a pdf still exist
+        Args:
+            - parser (PDFParser) parser for pdf
+            - catalog (Catalog) catalog the pdf's -data.json file was recorded in
+        Returns list of str error messages
+    """
+    errors = []
+    for sections, title, path in catalog.get_chapter_paths(parser):
+        if not path or not os.path.exists(path):
+            location = ' > '.join([parser.pdf_data_path] + list(sections) + [title])
+            errors.append('{}: split pdf {} does not exist'.format(location, path))
+    return errors
+
+def validate_data_files(directory, workers=8, catalog=None):
+    """
+        Checks every -data.json file under a directory at the same time
+        Args:
+            - directory (str) directory to check
+            - workers (int) number of files to check at once (optional)
+            - catalog (Catalog) catalog to skip reading files that haven't changed since they were recorded (optional)
+        Returns list of str error messages
+
+        ---
+
+        Note: files the catalog recorded were checked before they were recorded, so only
+        their split pdfs are checked again (they may have been moved or deleted since)
+    """
+    pdf_paths = []
+    for subdirectory, folders, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[-1] == '.pdf':
+                pdf_paths.append(os.path.sep.join([subdirectory, file]))
+
+    # The catalog's connection can only be used from this thread
+    errors = []
+    if catalog:
+        changed_paths = []
+        for pdf_path in pdf_paths:
+            parser = PDFParser(pdf_path)
+            if catalog.has_data(parser):
+                errors.extend(validate_chapter_paths(parser, catalog))
+            else:
+                changed_paths.append(pdf_path)
+        pdf_paths = changed_paths
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors.extend(error for book_errors in executor.map(validate_data_file, pdf_paths) for error in book_errors)
+    return errors
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+# watchdog event types that mean a file was written (opening or reading a file, e.g. while
+# a book is regenerated, also sends events, and queueing those would rebuild it forever)
+CHANGE_EVENTS = ('created', 'modified', 'moved', 'closed')
+
+
+class DirectoryWatcher(object):
+    """
+        The DirectoryWatcher object calls a function for every pdf whose
+        files have changed under a directory. Bursts of changes to the same
+        pdf (e.g. a curator saving an -index.json file several times) are
+        grouped together so the pdf is only processed once they settle down
+    """
+
+    def __init__(self, directory, suffixes=('.pdf',), interval=1.0, debounce=2.0):
+        self.directory = directory      # Directory to watch
+        self.suffixes = suffixes        # File endings to watch for (e.g. '.pdf', '-index.json')
+        self.interval = interval        # Seconds between checks for changes
+        self.debounce = debounce        # Seconds to wait after the last change before processing a pdf
+        self.pending = {}               # Map of pdf paths to when they last changed
+        self.lock = threading.Lock()    # Guards pending (watchdog calls add_change from its own thread)
+        self.files = {}                 # Map of file paths to (mtime, size) when polling
+
+    def get_pdf_path(self, path):
+        """
+            Returns the pdf a changed file belongs to
+            Args: path (str) path to changed file
+            Returns str path to pdf or None if file isn't being watched
+        """
+        if not any(s for s in self.suffixes if path.endswith(s)):
+            return None
+        if path.endswith('-index.json'):
+            return path[:-len('-index.json')] + '.pdf'
+        return path
+
+    def add_change(self, path):
+        """
+            Marks a file's pdf as needing to be processed
+            Args: path (str) path to changed file
+            Returns None
+        """
+        pdf_path = self.get_pdf_path(path)
+        if pdf_path and os.path.exists(pdf_path):
+            with self.lock:
+                self.pending[pdf_path] = time.time()
+
+    def handle_event(self, event):
+        """
+            Marks a file's pdf as needing to be processed if a watchdog event changed it
+            Args: event (FileSystemEvent) watchdog event
+            Returns None
+        """
+        if not event.is_directory and event.event_type in CHANGE_EVENTS:
+            self.add_change(getattr(event, 'dest_path', None) or event.src_path)
+
+    def scan(self):
+        """
+            Reads the modified time and size of every watched file
+            Args: None
+            Returns dict of file paths to (mtime, size)
+        """
+        files = {}
+        for subdirectory, folders, myfiles in os.walk(self.directory):
+            for file in myfiles:
+                path = os.path.sep.join([subdirectory, file])
+                if any(s for s in self.suffixes if file.endswith(s)):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:  # File was removed while walking
+                        continue
+                    files[path] = (stat.st_mtime, stat.st_size)
+        return files
+
+    def poll(self):
+        """
+            Compares the watched files against the last scan and records any changes
+            Args: None
+            Returns None
+        """
+        files = self.scan()
+        for path, stat in files.items():
+            if self.files.get(path) != stat:
+                self.add_change(path)
+        self.files = files
+
+    def get_ready(self):
+        """
+            Returns the pdfs that haven't changed within the debounce period
+            Args: None
+            Returns list of pdf paths
+        """
+        now = time.time()
+        with self.lock:
+            ready = sorted(p for p, changed in self.pending.items() if now - changed >= self.debounce)
+            for path in ready:
+                del self.pending[path]
+        return ready
+
+    def watch(self, callback, initial=True):
+        """
+            Calls callback for every changed pdf until interrupted
+            Args:
+                - callback (function) function to call with the path of a changed pdf
+                - initial (bool) process every pdf found when the watch starts (optional)
+            Returns None
+        """
+        self.files = self.scan()
+        if initial:
+            for path in self.files:
+                self.add_change(path)
+            with self.lock:
+                self.pending = {p: 0 for p in self.pending}
+
+        try:
+            # watchdog uses inotify (or the platform equivalent) when it is installed
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            Observer = None
+
+        observer = None
+        if Observer:
+            watcher = self
+
+            class ChangeHandler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    watcher.handle_event(event)
+
+            observer = Observer()
+            observer.schedule(ChangeHandler(), self.directory, recursive=True)
+            observer.start()
+            print('Watching {} for changes...'.format(self.directory))
+        else:
+            print('Watching {} for changes (polling every {}s, install watchdog to use inotify)...'.format(self.directory, self.interval))
+
+        try:
+            while True:
+                if not observer:
+                    self.poll()
+                for path in self.get_ready():
+                    try:
+                        callback(path)
+                    except Exception as e:
+                        # Keep watching so the file can be fixed and saved again
+                        print('ERROR: Unable to process {} ({})'.format(path, str(e)))
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()